@@ -8,12 +8,16 @@ setuptools.setup(
     author_email="foo.bar@email.com",
     description="Clients for various data APIs",
     url="https://github.com/malmgrek/pandas-datastores",
-    packages=["stores"],
+    packages=setuptools.find_packages(include=["stores", "stores.*"]),
+    package_data={"stores.services": ["data/*.json"]},
     install_requires=[
         "attrs",
         "numpy",
         "pandas"
     ],
+    entry_points={
+        "console_scripts": ["stores=stores.cli:main"]
+    },
     keywords=[
         "RESTful APIs",
         "Open data",
@@ -1,4 +1,14 @@
+import importlib
+
 from . import common
 from .common import utils
-from .common.core import Endpoint
-from . import services
+from .common.core import Endpoint, get_many
+
+
+def __getattr__(name):
+    # Import the service clients and their dependencies only when used
+    if name == "services":
+        return importlib.import_module(".services", __name__)
+    raise AttributeError(
+        "module {0!r} has no attribute {1!r}".format(__name__, name)
+    )
@@ -0,0 +1,146 @@
+"""Command line interface
+
+Usage::
+
+    stores list
+    stores update [SOURCE ...] [--workers N] [--per-service N]
+
+"""
+import argparse
+import graphlib
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+from stores.common import registry
+
+
+def select(entries: Dict, names: List[str]) -> Dict:
+    """Selected sources together with their dependencies
+
+    """
+    if not names:
+        return entries
+    unknown = [x for x in names if x not in entries]
+    if unknown:
+        raise SystemExit("Unknown sources: {0}".format(", ".join(unknown)))
+    selected = {}
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected[name] = entries[name]
+            stack.extend(entries[name].depends)
+    return selected
+
+
+def update(
+        entries: Dict,
+        workers: int=4,
+        per_service: int=1,
+        out=sys.stdout
+) -> Dict:
+    """Update sources in dependency order
+
+    Sources whose dependencies are done are updated in parallel, with at
+    most ``per_service`` concurrent updates per service. A source whose
+    dependency failed is skipped. Returns the status of each source.
+
+    """
+    sorter = graphlib.TopologicalSorter({
+        k: [x for x in v.depends if x in entries] for (k, v) in entries.items()
+    })
+    sorter.prepare()
+    limits = {
+        x.service: threading.Semaphore(per_service) for x in entries.values()
+    }
+    clients = {}
+    lock = threading.Lock()
+    status = {}
+
+    def client(entry):
+        with lock:
+            if entry.service not in clients:
+                clients[entry.service] = entry.API()
+            return clients[entry.service]
+
+    def run(name):
+        entry = entries[name]
+        if any(status.get(x) != "ok" for x in entry.depends if x in entries):
+            return (name, "skipped", 0.0)
+        with limits[entry.service]:
+            start = time.perf_counter()
+            try:
+                entry.update(client(entry))
+            except Exception:
+                logging.exception("Updating {0} failed".format(name))
+                return (name, "failed", time.perf_counter() - start)
+            return (name, "ok", time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        while sorter.is_active():
+            running |= {
+                executor.submit(run, name) for name in sorter.get_ready()
+            }
+            (done, running) = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                (name, result, seconds) = future.result()
+                status[name] = result
+                print(
+                    "{0:<32} {1:<8} {2:8.2f} s".format(name, result, seconds),
+                    file=out
+                )
+                sorter.done(name)
+    return status
+
+
+def main(argv: List[str]=None):
+    parser = argparse.ArgumentParser(
+        prog="stores",
+        description="Manage cached data sources"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List registered sources")
+    parser_update = commands.add_parser(
+        "update",
+        help="Refresh caches in dependency order"
+    )
+    parser_update.add_argument(
+        "sources",
+        nargs="*",
+        help="Sources to update with their dependencies, defaults to all"
+    )
+    parser_update.add_argument(
+        "--workers", type=int, default=4,
+        help="Maximum number of concurrent updates"
+    )
+    parser_update.add_argument(
+        "--per-service", type=int, default=1,
+        help="Maximum number of concurrent updates per service"
+    )
+    args = parser.parse_args(argv)
+
+    entries = registry.discover()
+    if args.command == "list":
+        for (name, entry) in sorted(entries.items()):
+            print(
+                name + (
+                    " <- " + ", ".join(entry.depends) if entry.depends else ""
+                )
+            )
+        return 0
+
+    status = update(
+        select(entries, args.sources),
+        workers=args.workers,
+        per_service=args.per_service
+    )
+    return 0 if all(x == "ok" for x in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,9 @@
+from . import backends
 from . import caching
 from . import core
+from . import extract
+from . import px
+from . import registry
+from . import timeseries
+from . import tracing
 from . import utils
@@ -0,0 +1,357 @@
+"""Key-value cache backends with expiry
+
+A backend stores values under hashable keys until an absolute expiry time
+given in epoch seconds.
+
+"""
+import collections
+import functools
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Callable, Dict
+
+import attr
+
+from stores.common.core import throttle
+
+
+# Marker for cache misses
+MISSING = object()
+
+
+@attr.s(frozen=True)
+class Memory():
+    """Thread-safe in-memory backend
+
+    Expired entries are removed when read and swept every ``sweep`` writes,
+    so that keys which are never read again do not accumulate. With
+    ``maxsize``, the least recently used entries are evicted beyond that
+    many entries.
+
+    """
+
+    data = attr.ib(factory=collections.OrderedDict)
+    lock = attr.ib(factory=threading.Lock)
+    # Maximum number of entries, unbounded if None
+    maxsize = attr.ib(default=None)
+    # Number of writes between sweeps of expired entries
+    sweep = attr.ib(default=100)
+    writes = attr.ib(factory=lambda: [0])
+
+    def get(self, key, default=None):
+        with self.lock:
+            (value, expires) = self.data.get(key, (default, None))
+            if expires is not None and expires <= time.time():
+                del self.data[key]
+                return default
+            if key in self.data:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires: float):
+        with self.lock:
+            self.data[key] = (value, expires)
+            self.data.move_to_end(key)
+            self.writes[0] += 1
+            if self.writes[0] % self.sweep == 0:
+                now = time.time()
+                for k in [
+                        k for (k, (_, e)) in self.data.items()
+                        if e is not None and e <= now
+                ]:
+                    del self.data[k]
+            while self.maxsize is not None and len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+        return value
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def expires(self, key):
+        """Expiry time of a key or None if missing
+
+        """
+        with self.lock:
+            return self.data.get(key, (None, None))[1]
+
+
+@attr.s(frozen=True)
+class SQLite():
+    """Backend in an SQLite database file
+
+    The database can be shared by several processes, e.g. the workers of a
+    WSGI server, so that data fetched by one worker is visible to all of
+    them. Concurrent writers are serialized by SQLite's file locking. Values
+    are pickled.
+
+    """
+
+    filepath = attr.ib()
+    # Seconds to wait for a lock held by another process
+    timeout = attr.ib(default=30.0)
+    local = attr.ib(factory=threading.local)
+
+    def connect(self) -> sqlite3.Connection:
+        """Connection of the current thread and process
+
+        """
+        (pid, connection) = getattr(self.local, "connection", (None, None))
+        if pid != os.getpid():
+            Path(os.path.dirname(self.filepath)).mkdir(
+                parents=True, exist_ok=True
+            )
+            connection = sqlite3.connect(
+                self.filepath, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            self.local.connection = (os.getpid(), connection)
+        return connection
+
+    def get(self, key, default=None):
+        row = self.connect().execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (repr(key),)
+        ).fetchone()
+        if row is None:
+            return default
+        (value, expires) = row
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return default
+        return pickle.loads(value)
+
+    def set(self, key, value, expires: float):
+        self.connect().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) "
+            "VALUES (?, ?, ?)",
+            (
+                repr(key),
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                expires
+            )
+        )
+        return value
+
+    def delete(self, key):
+        self.connect().execute("DELETE FROM cache WHERE key = ?", (repr(key),))
+
+    def expires(self, key):
+        row = self.connect().execute(
+            "SELECT expires FROM cache WHERE key = ?", (repr(key),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+
+def from_url(url: str):
+    """Backend from a URL
+
+    Supported URLs are ``memory://``, ``memory://?maxsize=1000`` and
+    ``sqlite:///path/to/cache.db``.
+
+    """
+    (scheme, _, path) = url.partition("://")
+    if scheme == "memory":
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        return Memory(
+            maxsize=int(query["maxsize"][0]) if "maxsize" in query else None
+        )
+    if scheme == "sqlite":
+        return SQLite(os.path.abspath(path))
+    raise ValueError("Unknown cache backend {0}".format(url))
+
+
+def default():
+    """Backend configured with the environment variable ``STORES_CACHE``
+
+    Defaults to an in-memory backend.
+
+    """
+    return from_url(os.environ.get("STORES_CACHE", "memory://"))
+
+
+def cached(backend, key: Callable, expires: Callable, prefetcher=None):
+    """Cache the results of a function in a backend
+
+    Parameters
+    ----------
+    backend
+        Cache backend
+    key : Callable
+        Maps the function arguments to a cache key
+    expires : Callable
+        Maps the function arguments to an expiry time in epoch seconds
+    prefetcher : Prefetcher
+        Optional scheduler that keeps popular entries warm
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        cache = Memory()
+
+        @cached(
+            cache,
+            key=lambda x: ("square", x),
+            expires=lambda x: time.time() + 60
+        )
+        def square(x):
+            return x ** 2
+
+    """
+    def decorator(func: Callable):
+
+        def refresh(*args):
+            return backend.set(key(*args), func(*args), expires(*args))
+
+        @functools.wraps(func)
+        def wrapped(*args):
+            k = key(*args)
+            if prefetcher is not None:
+                prefetcher.track(k, functools.partial(refresh, *args))
+            value = backend.get(k, MISSING)
+            return refresh(*args) if value is MISSING else value
+
+        return wrapped
+
+    return decorator
+
+
+@attr.s(frozen=True)
+class Prefetcher():
+    """Background refresher of popular cache entries
+
+    Requests are counted per key. A daemon thread periodically refreshes the
+    most requested entries that are missing or expire within ``lead``
+    seconds, one at a time with at least ``interval`` seconds in between.
+
+    The counts decay exponentially with the given ``half_life`` so that
+    keys no longer requested are eventually forgotten, while yesterday's
+    popular keys are still warm in the morning. The ``top`` keys are never
+    forgotten, and at most ``capacity`` keys are tracked at a time.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        cache = Memory()
+        prefetcher = Prefetcher(cache, top=20)
+
+        @cached(cache, key=..., expires=..., prefetcher=prefetcher)
+        def fetch(lat, lon):
+            ...
+
+        prefetcher.start()
+
+    """
+
+    backend = attr.ib()
+    # Number of most requested keys to keep warm
+    top = attr.ib(default=10)
+    # Refresh this many seconds before expiry
+    lead = attr.ib(default=60.0)
+    # Minimum number of seconds between refreshes
+    interval = attr.ib(default=1.0)
+    # Number of seconds between checks
+    period = attr.ib(default=30.0)
+    # Maximum number of tracked keys
+    capacity = attr.ib(default=1000)
+    # Seconds in which the request counts halve
+    half_life = attr.ib(default=6 * 3600.0)
+    # Keys outside the top whose count decays below this are forgotten
+    minimum = attr.ib(default=0.01)
+    counts = attr.ib(factory=collections.Counter)
+    refreshers = attr.ib(factory=dict)
+    # Time of the previous decay
+    decayed = attr.ib(factory=lambda: [time.time()])
+    lock = attr.ib(factory=threading.Lock)
+    started = attr.ib(factory=threading.Event)
+
+    def track(self, key, refresh: Callable):
+        with self.lock:
+            self.counts[key] += 1
+            self.refreshers[key] = refresh
+            if len(self.counts) > self.capacity:
+                # Least requested keys are dropped, new ones first on ties
+                self.retain(dict(self.counts.most_common(self.capacity // 2)))
+
+    def retain(self, counts: Dict):
+        """Replace the counts and forget the refreshers of dropped keys
+
+        Call with the lock held.
+
+        """
+        self.counts.clear()
+        self.counts.update(counts)
+        for key in [k for k in self.refreshers if k not in counts]:
+            del self.refreshers[key]
+
+    def decay(self, now: float=None):
+        """Decay the counts by the time elapsed since the previous decay
+
+        Keys whose count drops below ``minimum`` are forgotten unless they
+        are among the ``top`` keys.
+
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            factor = 0.5 ** ((now - self.decayed[0]) / self.half_life)
+            self.decayed[0] = now
+            top = {k for (k, _) in self.counts.most_common(self.top)}
+            self.retain({
+                k: v * factor for (k, v) in self.counts.items()
+                if k in top or v * factor >= self.minimum
+            })
+
+    def due(self):
+        """Popular keys that are missing or about to expire
+
+        """
+        with self.lock:
+            keys = [k for (k, _) in self.counts.most_common(self.top)]
+        deadline = time.time() + self.lead
+        return [
+            k for k in keys
+            if (self.backend.expires(k) or 0) <= deadline
+        ]
+
+    def run_once(self, wait: Callable=lambda: None):
+        for key in self.due():
+            wait()
+            with self.lock:
+                refresh = self.refreshers.get(key)
+            if refresh is None:
+                continue
+            try:
+                refresh()
+            except Exception:
+                logging.exception("Prefetching {0} failed".format(key))
+
+    def run(self):
+        wait = throttle(self.interval)
+        while True:
+            self.run_once(wait)
+            self.decay()
+            time.sleep(self.period)
+
+    def start(self):
+        """Start the refresher thread once per process
+
+        """
+        with self.lock:
+            if self.started.is_set():
+                return self
+            self.started.set()
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
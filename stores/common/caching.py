@@ -1,14 +1,23 @@
 """Data caching in file system
 
 """
+import contextlib
+import gzip
+import hashlib
+import io
 import json
+import mmap
+import os
 import pickle
-from typing import Callable, Iterable
+import tempfile
+import time
+import uuid
+from typing import Callable, Iterable, Sequence
 
 import attr
 import pandas as pd
 
-from stores.common import utils
+from stores.common import tracing, utils
 
 
 @attr.s(frozen=True)
@@ -36,7 +45,17 @@ def Landfill(
     """Dump load source
 
     """
+    name = os.path.basename(filepath)
+    download = tracing.traced("download " + name, download)
+    dump = tracing.traced(
+        "dump " + name, dump, meta=tracing.filesize(filepath)
+    )
+    load = tracing.traced(
+        "load " + name, load, meta=tracing.filesize(filepath, cache="hit")
+    )
+
     @utils.mkdir(filepath)
+    @tracing.span("update " + name)
     def update(api):
         return dump(download(api), filepath)
 
@@ -47,34 +66,287 @@ def Landfill(
     )
 
 
-def Pickle(filepath: str, download: Callable):
+def open_compressed(
+        path: str,
+        mode: str="rb",
+        codec: str=None,
+        level: int=None
+):
+    """Open a binary file with streaming compression
+
+    Parameters
+    ----------
+    path : str
+        File path
+    mode : str
+        Either 'rb' or 'wb'
+    codec : str
+        One of 'gzip', 'zstd' (requires zstandard) or 'lz4' (requires lz4).
+        If None, the file is not compressed.
+    level : int
+        Compression level, defaults to the codec's default
+
+    """
+    if codec is None:
+        return open(path, mode)
+    if codec == "gzip":
+        return gzip.open(
+            path, mode, compresslevel=9 if level is None else level
+        )
+    if codec == "zstd":
+        import zstandard
+        if mode == "wb":
+            return zstandard.ZstdCompressor(
+                level=3 if level is None else level
+            ).stream_writer(open(path, "wb"))
+        # Buffered for the readline used by pickle
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        )
+    if codec == "lz4":
+        import lz4.frame
+        return lz4.frame.open(
+            path, mode, compression_level=0 if level is None else level
+        )
+    raise ValueError("Unknown codec: {0}".format(codec))
+
+
+def Pickle(
+        filepath: str,
+        download: Callable,
+        codec: str=None,
+        level: int=None
+):
     """Landfill of pickle
 
+    Optionally compressed with ``codec`` at the given ``level``, see
+    :func:`open_compressed`.
+
+    """
+    def dump(data, path):
+        with open_compressed(path, "wb", codec, level) as f:
+            pickle.dump(data, f)
+        return data
+
+    def load(path):
+        with open_compressed(path, "rb", codec) as f:
+            return pickle.load(f)
+
+    return Landfill(filepath, download, dump, load)
+
+
+@contextlib.contextmanager
+def _replacing(path: str):
+    """Binary file written aside and moved over ``path`` when closed
+
+    """
+    (fd, tmp) = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".",
+        prefix=os.path.basename(path) + "."
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        # Temporary files are private, keep the permissions of the cache
+        os.chmod(
+            tmp,
+            os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        )
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def Pickle5(filepath: str, download: Callable, threshold: int=1 << 16):
+    """Landfill of pickle protocol 5 with out-of-band buffers
+
+    Contiguous buffers larger than ``threshold`` bytes, such as the NumPy
+    blocks of a DataFrame, are written into a sidecar file next to
+    ``filepath`` instead of the pickle stream. Loading maps the sidecar into
+    memory so that the arrays are backed by the page cache rather than
+    copied through the stream. The mapping is copy-on-write, so the loaded
+    arrays are writable and modifying them does not change the cache.
+
+    Every update writes a new sidecar whose name is stored in the main file,
+    then replaces the main file and removes the previous sidecar. Readers
+    hence always see a matching pair, and previously loaded data stays valid
+    but keeps showing the old contents. Load again to see the new data.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        Source = Pickle5("/tmp/frame.p", lambda api: api.get(...))
+        df = Source.load()
+
     """
+    dirpath = os.path.dirname(filepath)
+    # Buffer offsets in the sidecar are aligned for vectorized access
+    alignment = 64
+
+    def header(path):
+        with open(path, "rb") as f:
+            return (pickle.load(f), f.read())
+
     def dump(data, path):
-        pickle.dump(data, open(path, "wb+"))
+        buffers = []
+
+        def buffer_callback(buffer):
+            try:
+                raw = buffer.raw()
+            except BufferError:
+                # Non-contiguous buffers are kept in-band
+                return True
+            if raw.nbytes < threshold:
+                return True
+            buffers.append(raw)
+            return False
+
+        stream = pickle.dumps(
+            data, protocol=5, buffer_callback=buffer_callback
+        )
+        sidecar = "{0}.{1}.buf".format(
+            os.path.basename(path), uuid.uuid4().hex
+        )
+        index = []
+        with _replacing(os.path.join(dirpath, sidecar)) as f:
+            for raw in buffers:
+                f.write(b"\0" * (-f.tell() % alignment))
+                index.append((f.tell(), raw.nbytes))
+                f.write(raw)
+        try:
+            previous = header(path)[0]["sidecar"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError):
+            previous = None
+        with _replacing(path) as f:
+            pickle.dump({"sidecar": sidecar, "index": index}, f, protocol=5)
+            f.write(stream)
+        if previous is not None and previous != sidecar:
+            # Existing mappings of the removed file stay valid
+            try:
+                os.unlink(os.path.join(dirpath, previous))
+            except FileNotFoundError:
+                pass
         return data
 
+    def mapped(meta):
+        if not meta["index"]:
+            return []
+        with open(os.path.join(dirpath, meta["sidecar"]), "rb") as f:
+            view = memoryview(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            )
+        return [view[i:i + n] for (i, n) in meta["index"]]
+
     def load(path):
-        return pickle.load(open(path, "rb"))
+        (meta, stream) = header(path)
+        while True:
+            try:
+                return pickle.loads(stream, buffers=mapped(meta))
+            except FileNotFoundError:
+                # The sidecar was removed by a concurrent update, in which
+                # case the main file names a new one
+                (latest, stream) = header(path)
+                if latest["sidecar"] == meta["sidecar"]:
+                    raise
+                meta = latest
 
     return Landfill(filepath, download, dump, load)
 
 
-def JSON(filepath: str, download: Callable):
+def JSON(
+        filepath: str,
+        download: Callable,
+        codec: str=None,
+        level: int=None
+):
     """Landfill of json
 
+    Optionally compressed with ``codec`` at the given ``level``, see
+    :func:`open_compressed`.
+
     """
     def dump(data, path):
-        json.dump(data, open(path, "w+"))
+        with io.TextIOWrapper(
+                open_compressed(path, "wb", codec, level), encoding="utf-8"
+        ) as f:
+            json.dump(data, f)
         return data
 
     def load(path):
-        return json.load(open(path, "r"))
+        with io.TextIOWrapper(
+                open_compressed(path, "rb", codec), encoding="utf-8"
+        ) as f:
+            return json.load(f)
 
     return Landfill(filepath, download, dump, load)
 
 
+def benchmark(
+        data,
+        codecs: Sequence=(None, "gzip", "zstd", "lz4"),
+        levels: Sequence=(None,),
+        Format: Callable=Pickle,
+        repeat: int=3
+) -> pd.DataFrame:
+    """Compression ratio and throughput of landfill codecs
+
+    Dumps and loads the data in a temporary directory with each codec and
+    level using the landfill constructor ``Format``. Codecs whose module is
+    not installed are skipped. Throughputs are in megabytes of uncompressed
+    data per second, best of ``repeat`` runs.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        df = paavo.AllVariables2018(filepath).load()
+        caching.benchmark(df, levels=(1, 3, 9))
+
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as dirpath:
+        raw = os.path.join(dirpath, "raw")
+        Format(raw, lambda api: data).update(None)
+        size = os.path.getsize(raw)
+        for codec in codecs:
+            for level in (levels if codec is not None else (None,)):
+                path = os.path.join(dirpath, "{0}-{1}".format(codec, level))
+                source = Format(
+                    path,
+                    lambda api: data,
+                    codec=codec,
+                    level=level
+                )
+                try:
+                    dump = min(
+                        _timed(lambda: source.update(None))
+                        for _ in range(repeat)
+                    )
+                except ImportError:
+                    continue
+                load = min(_timed(source.load) for _ in range(repeat))
+                compressed = os.path.getsize(path)
+                rows.append({
+                    "codec": codec or "none",
+                    "level": level,
+                    "bytes": compressed,
+                    "ratio": size / compressed,
+                    "dump_mb_s": size / dump / 1e6,
+                    "load_mb_s": size / load / 1e6
+                })
+    return pd.DataFrame(rows)
+
+
+def _timed(func: Callable) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
 def HDF5(filepath: str, download: Callable):
     """Landfill of hdf5
 
@@ -90,6 +362,51 @@ def HDF5(filepath: str, download: Callable):
     return Landfill(filepath, download, dump, load)
 
 
+def Keyed(backend, key, download: Callable, ttl: float=None):
+    """Source stored under a key in a cache backend
+
+    With a shared backend such as ``backends.SQLite`` the data is visible to
+    all processes using the same database.
+
+    Parameters
+    ----------
+    backend
+        Cache backend, see ``stores.common.backends``
+    key
+        Key of the data in the backend
+    download : Callable
+        Downloads the data using an API client
+    ttl : float
+        Seconds until the stored data expires. If None, never expires.
+
+    """
+    def update(api):
+        return backend.set(
+            key,
+            download(api),
+            time.time() + ttl if ttl is not None else float("inf")
+        )
+
+    return Source(
+        download=download,
+        load=lambda: backend.get(key),
+        update=update
+    )
+
+
+def Loaded(source: Source):
+    """Source whose update only loads the existing cache
+
+    Useful for deriving data from caches that have already been updated.
+
+    """
+    return Source(
+        download=source.download,
+        load=source.load,
+        update=lambda api: source.load()
+    )
+
+
 def lift(func: Callable):
     """Lift a function
 
@@ -104,18 +421,21 @@ def lift(func: Callable):
         Tripled = triple(Source)
 
     """
+    name = getattr(func, "__name__", "lifted")
+    f = tracing.traced(name, func)
+
     def lifted(*sources: Source):
 
         return Source(
-            download=lambda api: func(
+            download=tracing.traced("download " + name, lambda api: f(
                 *utils.tuplemap(lambda x: x.download(api))(sources)
-            ),
-            load=lambda: func(
+            )),
+            load=tracing.traced("load " + name, lambda: f(
                 *utils.tuplemap(lambda x: x.load())(sources)
-            ),
-            update=lambda api: func(
+            )),
+            update=tracing.traced("update " + name, lambda api: f(
                 *utils.tuplemap(lambda x: x.update(api))(sources)
-            )
+            ))
         )
 
     return lifted
@@ -125,18 +445,21 @@ def bind(func: Callable):
     """Bind a function which returns a data source
 
     """
+    name = getattr(func, "__name__", "bound")
+    f = tracing.traced(name, func)
+
     def bound(*sources: Source):
         return Source(
             # FIXME: Unnecessary lambda definition?
-            download=lambda api: func(
+            download=tracing.traced("download " + name, lambda api: f(
                 *utils.tuplemap(lambda x: x.download(api))(sources)
-            ).download(api),
-            load=lambda: func(
+            ).download(api)),
+            load=tracing.traced("load " + name, lambda: f(
                 *utils.tuplemap(lambda x: x.load())(sources)
-            ).load(),
-            update=lambda api: func(
+            ).load()),
+            update=tracing.traced("update " + name, lambda api: f(
                 *utils.tuplemap(lambda x: x.update(api))(sources)
-            ).update(api)
+            ).update(api))
         )
 
     return bound
@@ -152,3 +475,98 @@ def Concat(sources: Iterable[Source], **kwargs):
         return pd.concat(frames, **kwargs)
 
     return concat(*sources)
+
+
+def fingerprint(data) -> str:
+    """Content hash of data flowing through sources
+
+    """
+    digest = hashlib.sha1()
+
+    def feed(x):
+        if isinstance(x, (pd.DataFrame, pd.Series)):
+            digest.update(repr((x.shape, x.dtypes.to_dict(), x.axes)).encode())
+            try:
+                digest.update(pd.util.hash_pandas_object(x).values.tobytes())
+            except TypeError:
+                # Unhashable cell values such as lists
+                digest.update(pickle.dumps(x))
+        elif isinstance(x, dict):
+            for (k, v) in sorted(x.items(), key=lambda kv: repr(kv[0])):
+                feed(k)
+                feed(v)
+        elif isinstance(x, (list, tuple)):
+            for y in x:
+                feed(y)
+        else:
+            digest.update(pickle.dumps(x))
+
+    feed(data)
+    return digest.hexdigest()
+
+
+def memoize(filepath: str):
+    """Lift a function with a persistent result cache
+
+    memoize :: str -> (a -> b) -> Source(a) -> Source(b)
+
+    The result is recomputed on update only if the fingerprint of the input
+    data has changed. The fingerprint is stored next to the result. Loading
+    reads the stored result without touching the input sources.
+
+    Example
+    -------
+
+    ..code-block :: python
+
+        @memoize("/path/to/tripled.p")
+        def triple(x):
+            return 3 * x
+
+        Tripled = triple(Source)
+
+    """
+    def decorator(func: Callable):
+
+        name = os.path.basename(filepath)
+        compute = tracing.traced(
+            getattr(func, "__name__", "memoized"),
+            func,
+            meta=lambda *args: {"cache": "miss"}
+        )
+
+        def memoized(*sources: Source):
+
+            @tracing.span(
+                "load " + name, meta=tracing.filesize(filepath, cache="hit")
+            )
+            def load():
+                with open(filepath, "rb") as f:
+                    return pickle.load(f)
+
+            @utils.mkdir(filepath)
+            @tracing.span("update " + name)
+            def update(api):
+                args = utils.tuplemap(lambda x: x.update(api))(sources)
+                key = fingerprint(args)
+                keypath = filepath + ".sha1"
+                if os.path.exists(filepath) and os.path.exists(keypath):
+                    with open(keypath, "r") as f:
+                        if f.read() == key:
+                            return load()
+                data = compute(*args)
+                with open(filepath, "wb+") as f:
+                    pickle.dump(data, f)
+                with open(keypath, "w+") as f:
+                    f.write(key)
+                return data
+
+            return Source(
+                download=lift(func)(*sources).download,
+                load=load,
+                update=update
+            )
+
+        return memoized
+
+    return decorator
@@ -1,11 +1,23 @@
 import logging
+import multiprocessing
 import requests
+import threading
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+)
+from typing import Callable, Dict, Iterable, List
 
 import attr
 
+from stores.common import tracing
 from stores.common.utils import identity, update_dict
 
 
+def response_meta(response, *args, **kwargs):
+    return {"url": response.url, "bytes": len(response.content)}
+
+
 def add_params(url, **params):
     return url + (
         "" if not params else "&".join(
@@ -34,7 +46,11 @@ class Endpoint():
     tf_post_response = attr.ib(default=identity)
     timeout = attr.ib(default=10.05)
 
-    def post(self, resource="", **params):
+    @tracing.span("http POST", meta=response_meta)
+    def post_response(self, resource="", **params):
+        """Raw response of a POST request
+
+        """
         url = self.url + resource
         logging.debug("POST {0}".format(url))
         r = self.session.post(
@@ -44,9 +60,13 @@ class Endpoint():
             timeout=self.timeout
         )
         r.raise_for_status()
-        return self.tf_post_response(r)
+        return r
 
-    def get(self, resource="", **params):
+    @tracing.span("http GET", meta=response_meta)
+    def get_response(self, resource="", **params):
+        """Raw response of a GET request
+
+        """
         url = add_params(
             self.url + self.tf_get_resource(resource),
             **update_dict(self.defaults, self.tf_get_params(params))
@@ -58,4 +78,147 @@ class Endpoint():
             timeout=self.timeout
         )
         r.raise_for_status()
-        return self.tf_get_response(r)
+        return r
+
+    @tracing.span("post")
+    def post(self, resource="", **params):
+        return self.tf_post_response(self.post_response(resource, **params))
+
+    @tracing.span("get")
+    def get(self, resource="", **params):
+        return self.tf_get_response(self.get_response(resource, **params))
+
+
+# ================
+# Batch processing
+# ================
+
+
+# Response transformation of the current worker process
+_transform = identity
+
+
+def _set_transform(transform: Callable):
+    global _transform
+    _transform = transform
+
+
+def _apply_transform(response):
+    return _transform(response)
+
+
+def throttle(interval: float) -> Callable:
+    """Blocking wait function that spaces calls by at least ``interval``
+
+    Thread-safe, so it can be shared by the threads of a pool.
+
+    """
+    lock = threading.Lock()
+    schedule = [0.0]
+
+    def wait():
+        with lock:
+            now = time.monotonic()
+            delay = schedule[0] - now
+            schedule[0] = max(now, schedule[0]) + interval
+        if delay > 0:
+            time.sleep(delay)
+
+    return wait
+
+
+def get_many(
+        endpoint: Endpoint,
+        params: Iterable[Dict],
+        threads: int=4,
+        processes: int=None,
+        interval: float=0.0,
+        return_exceptions: bool=False
+) -> List:
+    """Concurrent GET requests to an endpoint
+
+    Responses are downloaded in a thread pool. Optionally the CPU-heavy
+    ``tf_get_response`` transformations are run in a process pool so that
+    parsing overlaps with network I/O across cores.
+
+    Parameters
+    ----------
+    endpoint : Endpoint
+        Target endpoint
+    params : Iterable[Dict]
+        Keyword arguments of each ``get`` call. The key ``resource`` is
+        passed as the resource.
+    threads : int
+        Number of download threads
+    processes : int
+        Number of parsing processes. If None, responses are transformed in
+        the download threads.
+    interval : float
+        Minimum number of seconds between consecutive requests
+    return_exceptions : bool
+        If True, a failed request or transformation is returned in place of
+        its result instead of raising
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        api = fmi.API()
+        frames = get_many(
+            api.forecast_hirlam_surface_point_hourly_2d,
+            [{"lat": 60.17, "lon": 24.94}, {"lat": 65.01, "lon": 25.47}],
+            processes=2
+        )
+
+    NOTE: The transformations are usually closures which cannot be pickled,
+          so the worker processes are forked and inherit the transformation.
+          Process pool parsing is hence available only on platforms that
+          support the fork start method.
+
+    """
+    wait = throttle(interval)
+
+    def fetch(kwargs):
+        wait()
+        return endpoint.get_response(**kwargs)
+
+    def result(future):
+        try:
+            return future.result()
+        except Exception as error:
+            if not return_exceptions:
+                raise
+            return error
+
+    if processes is None:
+        with ThreadPoolExecutor(max_workers=threads) as threads_:
+            return [
+                result(future) for future in [
+                    threads_.submit(
+                        lambda kwargs: endpoint.tf_get_response(fetch(kwargs)),
+                        kwargs
+                    ) for kwargs in params
+                ]
+            ]
+
+    with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_set_transform,
+            initargs=(endpoint.tf_get_response,)
+    ) as processes_:
+        # Workers are forked on the first submit. Force it before any
+        # download thread exists, since forking while threads hold locks
+        # (e.g. in urllib3 or logging) may deadlock the children.
+        processes_.submit(int).result()
+        with ThreadPoolExecutor(max_workers=threads) as threads_:
+            downloads = [threads_.submit(fetch, kwargs) for kwargs in params]
+            parsed = {
+                download: (
+                    processes_.submit(_apply_transform, download.result())
+                    if download.exception() is None else download
+                )
+                for download in as_completed(downloads)
+            }
+            return [result(parsed[download]) for download in downloads]
@@ -0,0 +1,56 @@
+"""Extraction of JSON payloads embedded in scraped pages
+
+"""
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+OPENING = re.compile(r"[{\[]")
+# Strings are matched as a whole so that brackets inside them are skipped
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+DEPTH = {"{": 1, "[": 1, "}": -1, "]": -1}
+
+
+def match_bracket(text: str, begin: int) -> int:
+    """End offset of the JSON object or array starting at ``begin``
+
+    """
+    depth = 0
+    for token in TOKEN.finditer(text, begin):
+        depth += DEPTH.get(token.group(), 0)
+        if depth == 0:
+            return token.end()
+    raise ValueError("Unbalanced brackets in JSON payload")
+
+
+def extract_json(text: str, marker: str, start: int=0):
+    """Decode the first JSON object or array after a marker string
+
+    The payload is located by searching from the marker offset instead of
+    splitting the whole page. Without orjson the standard library decoder
+    parses in place, otherwise the payload boundaries are found by bracket
+    matching and only the payload is copied for decoding.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        settings = extract_json(res.text, "Drupal.settings,")
+
+    """
+    offset = text.find(marker, start)
+    if offset < 0:
+        raise ValueError("Marker {0!r} not found".format(marker))
+    opening = OPENING.search(text, offset + len(marker))
+    if opening is None:
+        raise ValueError("No JSON payload after {0!r}".format(marker))
+    begin = opening.start()
+    if orjson is not None:
+        return orjson.loads(text[begin:match_bracket(text, begin)])
+    return json.JSONDecoder().raw_decode(text, begin)[0]
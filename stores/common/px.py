@@ -0,0 +1,101 @@
+"""Parser for the PC-Axis (PX) file format
+
+A PX file consists of a metadata part of ``KEYWORD[lang]("sub")=value;``
+statements followed by a ``DATA=`` block of whitespace separated cells. The
+cells are laid out in row-major order with the ``STUB`` variables forming
+the rows and the ``HEADING`` variables forming the columns.
+
+"""
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from stores.common import utils
+
+
+KEYWORD = re.compile(
+    r'([A-Za-z0-9\-]+)(?:\[([\w\-]+)\])?(?:\("([^"]*)"\))?\s*=\s*'
+    r'((?:"[^"]*"|[^";])*);'
+)
+TOKEN = re.compile(r'"([^"]*)"|(,)|([^",\s]+)')
+
+
+def parse_value(value: str) -> List[str]:
+    """Split a keyword value into a list of items
+
+    Adjacent quoted strings are concatenated as they represent long strings
+    split over several lines.
+
+    """
+    items = [[]]
+    for (quoted, comma, bare) in TOKEN.findall(value):
+        if comma:
+            items.append([])
+        else:
+            items[-1].append(quoted or bare)
+    return ["".join(x) for x in items if x]
+
+
+def parse_meta(header: str) -> Dict:
+    """Keyword to value mapping
+
+    Keywords with a language suffix are skipped and the subkeyed keywords
+    such as ``VALUES("Vuosi")`` are collected into a nested dictionary.
+
+    """
+    meta = {}
+    for (keyword, language, subkey, value) in KEYWORD.findall(header):
+        if language:
+            continue
+        value = parse_value(value)
+        if subkey:
+            meta.setdefault(keyword, {})[subkey] = value
+        else:
+            meta[keyword] = value
+    return meta
+
+
+def parse_data(block: bytes) -> np.ndarray:
+    """Vectorized parse of the DATA block
+
+    Missing values, which are denoted by quoted dots or dashes, become NaN.
+
+    """
+    cells = np.array(block.replace(b";", b" ").split())
+    missing = np.char.startswith(cells, b'"')
+    cells[missing] = b"nan"
+    return cells.astype(float)
+
+
+def parse(content: bytes) -> pd.DataFrame:
+    """Parse a PX file into a data frame
+
+    The rows are indexed by the ``STUB`` variables and the columns by the
+    ``HEADING`` variables. Variable codes are used as labels where available.
+
+    """
+    (header, block) = content.split(b"DATA=", 1)
+    codepage = utils.pipe(
+        re.search(rb'CODEPAGE\s*=\s*"([^"]*)"', header),
+        lambda x: x.group(1).decode("ascii") if x else "iso-8859-15"
+    )
+    meta = parse_meta(header.decode(codepage))
+
+    def labels(variables):
+        return pd.MultiIndex.from_product(
+            [
+                meta.get("CODES", {}).get(v, meta["VALUES"][v])
+                for v in variables
+            ],
+            names=variables
+        )
+
+    index = labels(meta.get("STUB", []))
+    columns = labels(meta.get("HEADING", []))
+    return pd.DataFrame(
+        data=parse_data(block).reshape(len(index), len(columns)),
+        index=index,
+        columns=columns
+    )
@@ -0,0 +1,86 @@
+"""Registry of cached data sources
+
+Service modules register their source constructors so that all caches can
+be refreshed at once, see ``stores.cli``.
+
+"""
+import importlib
+import pkgutil
+from typing import Callable, Dict, Tuple
+
+import attr
+
+
+@attr.s(frozen=True)
+class Entry():
+    """Registered source
+
+    """
+
+    name = attr.ib()
+    # Name of the service module, requests are rate limited per service
+    service = attr.ib()
+    # Creates the API client of the service
+    API = attr.ib()
+    # Updates the cache given an API client
+    update = attr.ib()
+    # Names of the sources that need to be updated first
+    depends = attr.ib(default=())
+
+
+# Registered sources by name
+REGISTRY: Dict[str, Entry] = {}
+
+
+def register(API: Callable, depends: Tuple[str]=(), update: Callable=None):
+    """Register a source constructor taking no arguments
+
+    The source is named ``<service>.<constructor name>``.
+
+    Parameters
+    ----------
+    API : Callable
+        Creates the API client used for updating
+    depends : Tuple[str]
+        Names of the sources that need to be updated first
+    update : Callable
+        Custom update taking the API client. Defaults to updating the source
+        created with the constructor.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        @register(API, depends=("statfin.YearlyMeta",))
+        def Yearly():
+            ...
+
+    """
+    def decorator(Source: Callable):
+        service = Source.__module__.rsplit(".", 1)[-1]
+        name = "{0}.{1}".format(service, Source.__name__)
+        REGISTRY[name] = Entry(
+            name=name,
+            service=service,
+            API=API,
+            update=(
+                (lambda api: Source().update(api)) if update is None
+                else update
+            ),
+            depends=tuple(depends)
+        )
+        return Source
+
+    return decorator
+
+
+def discover(package: str="stores.services") -> Dict[str, Entry]:
+    """Import all modules of a package and return the registry
+
+    """
+    for module in pkgutil.iter_modules(
+            importlib.import_module(package).__path__
+    ):
+        importlib.import_module(package + "." + module.name)
+    return REGISTRY
@@ -0,0 +1,167 @@
+"""Append-only time series storage in file system
+
+"""
+import json
+import os
+import pickle
+
+import attr
+import numpy as np
+import pandas as pd
+
+from stores.common import utils
+
+
+@attr.s(frozen=True)
+class ChunkStore():
+    """Append-only store of column-oriented chunks
+
+    Each append writes the new rows into a separate chunk file. An index file
+    records the time range and the keys of every chunk together with the
+    latest time of each key, so that appends are deduplicated without
+    reading old chunks, and queries read only the chunks they need.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        store = ChunkStore("/path/to/store", key="isin", time="timestamp")
+        store.append(snapshot)
+        nokia = store.history("FI0009000681")
+        morning = store.cross_section(1608620400)
+
+    """
+
+    dirpath = attr.ib()
+    # Name of the series identifier column
+    key = attr.ib()
+    # Name of the numeric time column
+    time = attr.ib()
+
+    @property
+    def indexpath(self):
+        return os.path.join(self.dirpath, "index.json")
+
+    def read_index(self):
+        if not os.path.exists(self.indexpath):
+            return {"chunks": [], "last": {}}
+        with open(self.indexpath, "r") as f:
+            return json.load(f)
+
+    def read_chunk(self, chunk):
+        with open(os.path.join(self.dirpath, chunk["file"]), "rb") as f:
+            return pickle.load(f)
+
+    def append(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Append rows that are newer than the stored rows of their key
+
+        Only the key, time and numeric columns are stored. Returns the
+        appended rows.
+
+        """
+        index = self.read_index()
+        columns = [self.key, self.time] + [
+            c for c in frame.columns
+            if c not in (self.key, self.time)
+            and pd.api.types.is_numeric_dtype(frame[c])
+        ]
+        rows = utils.pipe(
+            frame[columns].drop_duplicates([self.key, self.time]),
+            lambda x: x[
+                x[self.time].to_numpy() > x[self.key].map(
+                    lambda k: index["last"].get(str(k), -np.inf)
+                ).to_numpy(dtype=float)
+            ],
+            lambda x: x.reset_index(drop=True)
+        )
+        if rows.empty:
+            return rows
+
+        chunk = {
+            "file": "{0:08d}.p".format(len(index["chunks"])),
+            "start": float(rows[self.time].min()),
+            "stop": float(rows[self.time].max()),
+            "keys": sorted(map(str, rows[self.key].unique()))
+        }
+        last = rows.groupby(self.key)[self.time].max()
+
+        @utils.mkdir(os.path.join(self.dirpath, chunk["file"]))
+        def write():
+            with open(os.path.join(self.dirpath, chunk["file"]), "wb+") as f:
+                pickle.dump(rows, f)
+            # Replace the index atomically so that readers never see a
+            # partially written index
+            with open(self.indexpath + ".tmp", "w+") as f:
+                json.dump(
+                    {
+                        "chunks": index["chunks"] + [chunk],
+                        "last": {
+                            **index["last"],
+                            **{str(k): float(v) for (k, v) in last.items()}
+                        }
+                    },
+                    f
+                )
+            os.replace(self.indexpath + ".tmp", self.indexpath)
+
+        write()
+        return rows
+
+    def read(self) -> pd.DataFrame:
+        """All stored rows
+
+        """
+        return self.concat(self.read_index()["chunks"])
+
+    def history(self, key) -> pd.DataFrame:
+        """Rows of one key indexed by time
+
+        Reads only the chunks containing the key.
+
+        """
+        return utils.pipe(
+            self.read_index()["chunks"],
+            utils.listfilter(lambda c: str(key) in c["keys"]),
+            self.concat,
+            lambda x: x[x[self.key].astype(str) == str(key)],
+            lambda x: x.set_index(self.time).sort_index()
+        )
+
+    def cross_section(self, time) -> pd.DataFrame:
+        """Latest row of each key at or before the given time
+
+        Chunks are read from the most recently appended backwards until
+        every key present before the given time has been found. Since the
+        times of each key increase in append order, the first rows found for
+        a key are its latest ones.
+
+        """
+        chunks = [
+            c for c in reversed(self.read_index()["chunks"])
+            if c["start"] <= time
+        ]
+        needed = set(utils.flatten([c["keys"] for c in chunks]))
+        (found, frames) = (set(), [])
+        for chunk in chunks:
+            if needed <= found:
+                break
+            if not set(chunk["keys"]) - found:
+                continue
+            frame = self.read_chunk(chunk)
+            frame = frame[frame[self.time] <= time]
+            frames.append(frame)
+            found |= set(frame[self.key].astype(str))
+        return utils.pipe(
+            pd.concat(frames) if frames else self.concat([]),
+            lambda x: x.sort_values(self.time),
+            lambda x: x.drop_duplicates(self.key, keep="last"),
+            lambda x: x.set_index(self.key).sort_index()
+        )
+
+    def concat(self, chunks) -> pd.DataFrame:
+        frames = [self.read_chunk(c) for c in chunks]
+        return (
+            pd.concat(frames, ignore_index=True) if frames else
+            pd.DataFrame(columns=[self.key, self.time])
+        )
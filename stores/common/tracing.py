@@ -0,0 +1,153 @@
+"""Opt-in tracing of data source graphs
+
+Set the environment variable ``STORES_TRACE`` to an output path to record
+nested spans of source downloads, loads, updates, transformations and HTTP
+requests. At exit the spans are written as Chrome trace-event JSON (open in
+chrome://tracing or Perfetto) or, if the path ends with ``.folded``, as
+folded stacks for flame graph tools.
+
+.. code-block:: bash
+
+    STORES_TRACE=trace.json python script.py
+
+When the variable is not set, the tracing decorators return the functions
+unchanged so there is no overhead.
+
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+
+PATH = os.environ.get("STORES_TRACE")
+ENABLED = bool(PATH)
+
+# Recorded spans
+EVENTS = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def span(name: str, meta: Callable=None):
+    """Decorator recording the calls of a function as spans
+
+    Parameters
+    ----------
+    name : str
+        Span name
+    meta : Callable
+        Maps ``(result, *args, **kwargs)`` to a dictionary of span
+        attributes such as bytes read or cache hit/miss
+
+    """
+    def decorator(func: Callable):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            stack = _local.__dict__.setdefault("stack", [])
+            frame = {"name": name, "children": 0.0}
+            stack.append(frame)
+            (wall, cpu) = (time.perf_counter(), time.thread_time())
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - wall
+                cpu = time.thread_time() - cpu
+                stack.pop()
+                if stack:
+                    stack[-1]["children"] += duration
+            try:
+                extra = meta(result, *args, **kwargs) if meta else {}
+            except Exception:
+                extra = {}
+            with _lock:
+                EVENTS.append({
+                    "name": name,
+                    "stack": [x["name"] for x in stack] + [name],
+                    "start": wall,
+                    "duration": duration,
+                    "self": duration - frame["children"],
+                    "cpu": cpu,
+                    "tid": threading.get_ident(),
+                    "args": extra
+                })
+            return result
+
+        return wrapped
+
+    return decorator
+
+
+def traced(name: str, func: Callable, meta: Callable=None) -> Callable:
+    """Functional form of :func:`span`
+
+    """
+    return span(name, meta)(func)
+
+
+def filesize(path: str, **attributes) -> Callable:
+    """Span attributes with the size of a file
+
+    """
+    def meta(*args, **kwargs):
+        return {"bytes": os.path.getsize(path), **attributes}
+
+    return meta
+
+
+def chrome(events) -> dict:
+    """Chrome trace-event format
+
+    """
+    origin = min([x["start"] for x in events], default=0.0)
+    return {
+        "traceEvents": [
+            {
+                "name": x["name"],
+                "ph": "X",
+                "ts": (x["start"] - origin) * 1e6,
+                "dur": x["duration"] * 1e6,
+                "pid": os.getpid(),
+                "tid": x["tid"],
+                "args": {"cpu_ms": x["cpu"] * 1e3, **x["args"]}
+            } for x in events
+        ]
+    }
+
+
+def folded(events) -> str:
+    """Folded stacks weighted by self time in microseconds
+
+    """
+    totals = {}
+    for x in events:
+        key = ";".join(x["stack"])
+        totals[key] = totals.get(key, 0) + x["self"] * 1e6
+    return "".join(
+        "{0} {1}\n".format(k, int(round(v))) for (k, v) in totals.items()
+    )
+
+
+def export(path: str):
+    """Write the recorded spans into a file
+
+    """
+    with _lock:
+        events = list(EVENTS)
+    with open(path, "w+") as f:
+        if path.endswith(".folded"):
+            f.write(folded(events))
+        else:
+            json.dump(chrome(events), f)
+    logging.info("Wrote {0} trace spans to {1}".format(len(events), path))
+
+
+if ENABLED:
+    atexit.register(export, PATH)
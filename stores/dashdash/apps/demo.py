@@ -7,8 +7,6 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 
 
@@ -48,6 +46,8 @@ def set_callbacks(app: dash.Dash):
         ]
     )
     def update_figure(name):
+        import plotly.graph_objects as go
+
         fig = go.Figure()
         x = np.arange(10)
         data_generator = (
@@ -2,19 +2,21 @@
 
 """
 
+import time
 from itertools import product
 
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from dash.dependencies import Input, Output, State
 
 from stores import utils
-from stores.services import fmi
+from stores.common import backends
+
+import plotting
+
+# NOTE: Plotly and the service clients are imported in the functions using
+#       them to keep the startup of the server light
 
 
 # 'GeopHeight', 'Temperature', 'Pressure', 'Humidity', 'WindDirection',
@@ -69,53 +71,114 @@ def Layout():
             dcc.Graph(
                 id="graph",
                 className="DefaultGraph",
-            )
+            ),
+            # Structure of the rendered figure for partial updates
+            dcc.Store(id="graph-signature")
         ]
     )
 
 
+# Server-side cache shared by all callbacks and sessions, and by worker
+# processes if configured with STORES_CACHE=sqlite:///path/to/cache.db
+cache = backends.default()
+# Popular locations are refreshed in the background when the forecast
+# moves forward. The thread is started by the first figure request, so that
+# registering the callbacks at server startup has no side effects.
+prefetcher = backends.Prefetcher(cache, top=20, lead=0.0, interval=2.0)
+
+
+def rounded(lat, lon):
+    """Nearby locations share cache entries
+
+    """
+    return (round(lat, 2), round(lon, 2))
+
+
+def expires(*args):
+    """Forecasts start from the current hour so they expire at the next hour
+
+    """
+    return (time.time() // 3600 + 1) * 3600
+
+
+@backends.cached(
+    cache,
+    key=lambda lat, lon: ("hirlam-data", lat, lon),
+    expires=expires
+)
+def fetch(lat, lon):
+    from stores.services import fmi
+    api = fmi.API()
+    return api.forecast_hirlam_surface_point_hourly_2d.get(
+        lat=lat, lon=lon, columns=dimensions
+    )
+
+
+@backends.cached(
+    cache,
+    key=lambda lat, lon: ("hirlam-figure", lat, lon),
+    expires=expires,
+    prefetcher=prefetcher
+)
+def Figure(lat, lon):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=ncols,
+        cols=ncols
+    )
+
+    data = fetch(lat, lon)
+    rowcols = utils.pipe(
+        range(1, ncols + 1),
+        lambda x: list(product(x, x))
+    )
+    for (dim, (row, col)) in zip(dimensions, rowcols):
+        fig.add_trace(
+            plotting.Scattergl(
+                data.index, data[dim], width=2000 // ncols, name=dim
+            ),
+            row=row,
+            col=col,
+        )
+        fig.update_yaxes(title_text=dim, row=row, col=col)
+
+    fig.update_layout(
+        height=1000,
+        width=2000,
+        title_text="FMI | HIRLAM | forecasts",
+        showlegend=False
+    )
+
+    return fig.to_plotly_json()
+
+
 def set_callbacks(app: dash.Dash):
 
     @app.callback(
-        Output("graph", "figure"),
+        [
+            Output("graph", "figure"),
+            Output("graph-signature", "data")
+        ],
         [
             Input("lat", "value"),
             Input("lon", "value")
+        ],
+        [
+            State("graph-signature", "data")
         ]
     )
-    def update_figure(lat, lon):
-
-        fig = make_subplots(
-            rows=ncols,
-            cols=ncols
-        )
+    def update_figure(lat, lon, current):
+        from plotly.subplots import make_subplots
 
         if lat is None or lon is None:
-            return fig
-
-        api = fmi.API()
-        data = api.forecast_hirlam_surface_point_hourly_2d.get(
-            lat=lat, lon=lon
-        )
-        rowcols = utils.pipe(
-            range(1, ncols + 1),
-            lambda x: list(product(x, x))
-        )
-        for (dim, (row, col)) in zip(dimensions, rowcols):
-            fig.add_trace(
-                go.Scatter(x=data.index, y=data[dim], name=dim),
-                row=row,
-                col=col,
-            )
-            fig.update_yaxes(title_text=dim, row=row, col=col)
-
-        fig.update_layout(
-            height=1000,
-            width=2000,
-            title_text="FMI | HIRLAM | forecasts",
-            showlegend=False
-        )
+            return [make_subplots(rows=ncols, cols=ncols), None]
 
-        return fig
+        prefetcher.start()
+        figure = Figure(*rounded(lat, lon))
+        return [
+            plotting.patch(current, figure),
+            plotting.signature(figure)
+        ]
 
     return app
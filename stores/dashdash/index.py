@@ -31,22 +31,19 @@ def set_routes(
 
     """
 
-    # Shove `app` through mutilations and collect layouts
-    (app, layout_map) = reduce(
-        lambda acc, cur: (
-            cur.set_callbacks(acc[0]),
-            {**acc[1], **{cur.href: cur.Layout()}}
-        ),
-        subpages,
-        (app, {})
-    )
+    # Shove `app` through mutilations. Layouts are built on first visit.
+    app = reduce(lambda acc, cur: cur.set_callbacks(acc), subpages, app)
+    subpage_map = {x.href: x for x in subpages}
 
     @app.callback(
         Output("page-content", "children"),
         [Input("url", "pathname")]
     )
     def display_page(href):
-        return layout_map.get(href, pages.index_page)
+        return (
+            subpage_map[href].Layout() if href in subpage_map
+            else pages.index_page
+        )
 
     return app
 
@@ -0,0 +1,251 @@
+"""Background jobs for long running data pulls
+
+A callback submits the job and returns immediately. The browser then polls
+the job's progress with an interval component, and the result is rendered
+when it is ready.
+
+Usage
+-----
+
+.. code-block:: python
+
+    import jobs
+
+    store = jobs.JobStore()
+
+    def pull(zip_codes, progress):
+        ...
+        progress(0.5)
+        ...
+        return data
+
+    def Layout():
+        return html.Div([
+            dcc.Input(id="zip-codes"),
+            jobs.Progress("pull"),
+            dcc.Graph(id="graph")
+        ])
+
+    def set_callbacks(app):
+        return jobs.set_callbacks(
+            app,
+            store,
+            "pull",
+            inputs=[Input("zip-codes", "value")],
+            job=pull,
+            output=Output("graph", "figure"),
+            render=build_figure
+        )
+
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+from dash.dependencies import Input, Output, State
+
+from stores.common import backends
+
+
+class Cancelled(Exception):
+    """Raised by the progress callback of a cancelled job
+
+    """
+
+
+class JobStore():
+    """Runs jobs in a thread pool and keeps their status
+
+    Statuses and results expire ``ttl`` seconds after their last update, so
+    the results of jobs that are never polled again are purged. A job
+    superseded by a new one can be cancelled: a job not yet started is
+    dropped, and a running job stops at its next progress report.
+
+    Parameters
+    ----------
+
+    max_workers : int
+        Number of concurrent jobs
+    backend
+        Status storage, see ``stores.common.backends``
+    ttl : float
+        Seconds to keep the status and result of a job
+
+    """
+    def __init__(
+            self,
+            max_workers: int=4,
+            backend=None,
+            ttl: float=3600.0
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Sweep often, the results may be large
+        self.backend = (
+            backends.Memory(sweep=10) if backend is None else backend
+        )
+        self.ttl = ttl
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def update(self, job_id: str, **status):
+        with self.lock:
+            current = self.status(job_id)
+            if current["state"] == "cancelled":
+                return
+            self.backend.set(
+                ("job", job_id),
+                {**current, **status},
+                time.time() + self.ttl
+            )
+
+    def status(self, job_id: str):
+        """Dictionary with the state, progress and result of a job
+
+        The state is one of 'pending', 'running', 'done', 'failed',
+        'cancelled' or 'unknown' if the job has expired.
+
+        """
+        return self.backend.get(
+            ("job", job_id),
+            {"state": "unknown", "progress": 0.0, "result": None}
+        )
+
+    def submit(self, func: Callable, *args) -> str:
+        """Run ``func(*args, progress=...)`` in the background
+
+        The function may report its progress as a fraction in [0, 1] by
+        calling ``progress``. Returns the job identifier.
+
+        """
+        job_id = uuid.uuid4().hex
+        self.update(job_id, state="pending", progress=0.0, result=None)
+
+        def progress(x):
+            if self.status(job_id)["state"] == "cancelled":
+                raise Cancelled(job_id)
+            self.update(job_id, progress=x)
+
+        def run():
+            self.update(job_id, state="running")
+            try:
+                result = func(*args, progress=progress)
+            except Cancelled:
+                logging.info("Job {0} cancelled".format(job_id))
+            except Exception as error:
+                logging.exception("Job {0} failed".format(job_id))
+                self.update(job_id, state="failed", error=str(error))
+            else:
+                self.update(
+                    job_id, state="done", progress=1.0, result=result
+                )
+
+        future = self.executor.submit(run)
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda _: self.forget(job_id))
+        return job_id
+
+    def forget(self, job_id: str):
+        with self.lock:
+            self.futures.pop(job_id, None)
+
+    def cancel(self, job_id: str):
+        """Cancel a job and discard its result
+
+        """
+        with self.lock:
+            future = self.futures.pop(job_id, None)
+            self.backend.set(
+                ("job", job_id),
+                {"state": "cancelled", "progress": 0.0, "result": None},
+                time.time() + self.ttl
+            )
+        if future is not None:
+            future.cancel()
+
+
+def Progress(id: str, interval: int=1000):
+    """Components for tracking a job
+
+    """
+    return html.Div(
+        children=[
+            dcc.Store(id=id + "-job"),
+            dcc.Interval(
+                id=id + "-interval", interval=interval, disabled=True
+            ),
+            html.Progress(id=id + "-progress", max=1, value=0)
+        ]
+    )
+
+
+def set_callbacks(
+        app: dash.Dash,
+        store: JobStore,
+        id: str,
+        inputs: List[Input],
+        job: Callable,
+        output: Output,
+        render: Callable=lambda x: x
+):
+    """Start the job when the inputs change and render its result when done
+
+    Parameters
+    ----------
+    app : dash.Dash
+        The dash application object
+    store : JobStore
+        Job runner
+    id : str
+        Identifier given to :func:`Progress`
+    inputs : List[Input]
+        Inputs passed to the job
+    job : Callable
+        The job, called with the input values and the ``progress`` callback
+    output : Output
+        Output receiving the rendered result
+    render : Callable
+        Maps the job result to the output value
+
+    """
+
+    # A single callback, since Dash allows only one callback per output
+    @app.callback(
+        [
+            output,
+            Output(id + "-job", "data"),
+            Output(id + "-progress", "value"),
+            Output(id + "-interval", "disabled")
+        ],
+        [Input(id + "-interval", "n_intervals")] + inputs,
+        [State(id + "-job", "data")]
+    )
+    def run(n_intervals, *args):
+        (values, job_id) = (args[:-1], args[-1])
+        triggered = [
+            x["prop_id"] for x in dash.callback_context.triggered
+        ]
+        if id + "-interval.n_intervals" not in triggered:
+            # Inputs changed, replace the previous job
+            if job_id is not None:
+                store.cancel(job_id)
+            if any(x is None for x in values):
+                raise dash.exceptions.PreventUpdate
+            return [dash.no_update, store.submit(job, *values), 0, False]
+        if job_id is None:
+            raise dash.exceptions.PreventUpdate
+        status = store.status(job_id)
+        if status["state"] == "done":
+            return [render(status["result"]), dash.no_update, 1, True]
+        if status["state"] in ("failed", "cancelled", "unknown"):
+            return [dash.no_update, dash.no_update, 0, True]
+        return [dash.no_update, dash.no_update, status["progress"], False]
+
+    return app
@@ -0,0 +1,167 @@
+"""Load test of the gevent WSGI server
+
+Serves a Dash callback that downloads a HIRLAM forecast, like the HIRLAM
+app, from a local FMI stand-in which answers after a fixed delay. The
+throughput is measured for each number of concurrent users. With
+cooperative I/O the throughput grows with the number of users until the
+CPU becomes the bottleneck, whereas a blocking server stays at about
+``1 / delay`` requests per second.
+
+Usage::
+
+    python loadtest.py --delay 0.2 --users 1 5 20 --requests 100
+
+"""
+
+# Patch before anything imports sockets, see wsgi.py
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import time  # noqa: E402
+
+import dash  # noqa: E402
+import dash_core_components as dcc  # noqa: E402
+import dash_html_components as html  # noqa: E402
+import gevent  # noqa: E402
+import gevent.pool  # noqa: E402
+import requests  # noqa: E402
+import requests.adapters  # noqa: E402
+from dash.dependencies import Input, Output  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+from stores.services import fmi  # noqa: E402
+
+
+# Minimal multipoint coverage response with two hourly forecasts
+RESPONSE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:FeatureCollection
+    xmlns:wfs="http://www.opengis.net/wfs/2.0"
+    xmlns:gml="http://www.opengis.net/gml/3.2"
+    xmlns:gmlcov="http://www.opengis.net/gmlcov/1.0"
+    xmlns:swe="http://www.opengis.net/swe/2.0">
+  <gmlcov:positions>
+    60.17 24.94 1608595200
+    60.17 24.94 1608598800
+  </gmlcov:positions>
+  <swe:DataRecord>
+    <swe:field name="Temperature"/>
+    <swe:field name="Pressure"/>
+  </swe:DataRecord>
+  <gml:DataBlock>
+    <gml:doubleOrNilReasonTupleList>
+      3.59 1016.37
+      3.68 1016.34
+    </gml:doubleOrNilReasonTupleList>
+  </gml:DataBlock>
+</wfs:FeatureCollection>
+"""
+
+
+def stub(delay: float) -> WSGIServer:
+    """Local FMI stand-in answering after ``delay`` seconds
+
+    """
+    def application(environ, start_response):
+        time.sleep(delay)
+        start_response("200 OK", [("Content-Type", "text/xml")])
+        return [RESPONSE]
+
+    server = WSGIServer(("127.0.0.1", 0), application, log=None)
+    server.start()
+    return server
+
+
+def create_app(url: str) -> dash.Dash:
+    """Dash app with one callback downloading from the given FMI address
+
+    """
+    app = dash.Dash(__name__)
+    app.layout = html.Div([
+        dcc.Input(id="lat", type="number"),
+        dcc.Input(id="lon", type="number"),
+        html.Div(id="result")
+    ])
+
+    @app.callback(
+        Output("result", "children"),
+        [Input("lat", "value"), Input("lon", "value")]
+    )
+    def update(lat, lon):
+        data = fmi.API(url=url).forecast_hirlam_surface_point_hourly_2d.get(
+            lat=lat, lon=lon, columns=["Temperature", "Pressure"]
+        )
+        return "{0:.2f}".format(data["Temperature"].mean())
+
+    return app
+
+
+def measure(url: str, users: int, requests_: int) -> float:
+    """Requests per second with the given number of concurrent users
+
+    """
+    session = requests.Session()
+    session.mount(
+        "http://", requests.adapters.HTTPAdapter(pool_maxsize=users)
+    )
+
+    def call(i):
+        res = session.post(
+            url + "/_dash-update-component",
+            json={
+                "output": "result.children",
+                "outputs": {"id": "result", "property": "children"},
+                "inputs": [
+                    {"id": "lat", "property": "value", "value": 60 + i},
+                    {"id": "lon", "property": "value", "value": 24}
+                ],
+                "changedPropIds": ["lat.value"]
+            }
+        )
+        res.raise_for_status()
+
+    pool = gevent.pool.Pool(users)
+    start = time.perf_counter()
+    pool.map(call, range(requests_))
+    return requests_ / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--delay", type=float, default=0.2,
+        help="Response delay of the FMI stand-in in seconds"
+    )
+    parser.add_argument(
+        "--users", type=int, nargs="+", default=[1, 5, 20],
+        help="Numbers of concurrent users"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100,
+        help="Number of requests per measurement"
+    )
+    args = parser.parse_args(argv)
+
+    fmi_server = stub(args.delay)
+    app_server = WSGIServer(
+        ("127.0.0.1", 0),
+        create_app(
+            "http://127.0.0.1:{0}/wfs".format(fmi_server.server_port)
+        ).server,
+        log=None
+    )
+    app_server.start()
+    url = "http://127.0.0.1:{0}".format(app_server.server_port)
+    # Warm up
+    measure(url, 1, 1)
+    print("{0:>6} {1:>10}".format("users", "requests/s"))
+    for users in args.users:
+        print("{0:>6} {1:>10.1f}".format(
+            users, measure(url, users, args.requests)
+        ))
+    app_server.stop()
+    fmi_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,17 +8,22 @@ instance to the ``subpages`` list defined below.
 
 """
 
-from typing import Callable
+import importlib
 
 import dash_core_components as dcc
 import dash_html_components as html
 
-from apps import demo, hirlam
-
 
 class Subpage():
     """Container for subpage information
 
+    The layout is built lazily on first visit and only once. Dash needs the
+    callbacks before the first client loads, so the app module itself is
+    imported when the callbacks are registered at startup. App modules
+    should therefore import heavy dependencies, such as Plotly and the
+    service clients, inside the functions using them, and start background
+    work such as cache prefetching only on first use.
+
     Parameters
     ----------
 
@@ -29,12 +34,15 @@ class Subpage():
         This will constitute the endpoint where the app is found. For example
         setting the value to '/foobar' will imply that the app will be located
         at https://dash.leanheat.fi/foobar
-    set_callbacks : Callable[dash.Dash, CachedDatabaseConnection]
-        Mutilates the app object that is passed through different stages.
-        Typically consists of callback definitions but NOTE that can
-        in principle consist of any kind of mutation of app.
-    Layout : Callable[CachedDatabaseConnection]
-        A function that builds the html layout using database.
+    module : str
+        Import path of the app module, e.g. 'apps.demo'. The module defines
+        the functions
+
+        * set_callbacks(app) -- Mutilates the app object that is passed
+          through different stages. Typically consists of callback
+          definitions but NOTE that can in principle consist of any kind of
+          mutation of app.
+        * Layout() -- Builds the html layout.
     description : str
         Short description of the app. Will be displayed on the front page
         boxes.
@@ -44,16 +52,27 @@ class Subpage():
             self,
             name: str,
             href: str,
-            set_callbacks: Callable,
-            Layout: Callable,
+            module: str,
             # preview_image: str=None,
             description: str=None
     ):
         self.name = name
         self.href = href
-        self.set_callbacks = set_callbacks
-        self.Layout = Layout
+        self.module = module
         self.description = description
+        self._layout = None
+
+    @property
+    def app(self):
+        return importlib.import_module(self.module)
+
+    def set_callbacks(self, app):
+        return self.app.set_callbacks(app)
+
+    def Layout(self):
+        if self._layout is None:
+            self._layout = self.app.Layout()
+        return self._layout
 
 
 # Add new subpages into this list
@@ -61,8 +80,7 @@ subpages = [
     Subpage(
         name="Demo app",
         href="/demo",
-        set_callbacks=demo.set_callbacks,
-        Layout=demo.Layout,
+        module="apps.demo",
         description=(
             "Demo app"
         )
@@ -70,8 +88,7 @@ subpages = [
     Subpage(
         name="Hirlam forecasts",
         href="/hirlam",
-        set_callbacks=hirlam.set_callbacks,
-        Layout=hirlam.Layout,
+        module="apps.hirlam",
         description=(
             "Visualize different forecasts from the HIRLAM weather model"
         )
@@ -0,0 +1,125 @@
+"""Plotting helpers for the Dash apps
+
+Large series are downsampled on the server to about the pixel width of the
+plot and drawn with WebGL.
+
+"""
+
+from typing import Dict
+
+import dash
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the Largest-Triangle-Three-Buckets downsampling
+
+    Preserves the visual shape of a line by choosing from each bucket the
+    point forming the largest triangle with the previously chosen point and
+    the average of the next bucket.
+
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    selected = np.empty(n, dtype=int)
+    (selected[0], selected[-1]) = (0, size - 1)
+    a = 0
+    for i in range(n - 2):
+        (start, stop) = (edges[i], edges[i + 1])
+        (next_start, next_stop) = (
+            (edges[i + 1], edges[i + 2]) if i + 2 < len(edges)
+            else (size - 1, size)
+        )
+        (avg_x, avg_y) = (
+            x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        )
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a]) -
+            (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each bucket
+
+    Fully vectorized, keeps the extremes that would be visible in a plot.
+
+    """
+    size = len(y)
+    buckets = n // 2
+    if n >= size or buckets < 1:
+        return np.arange(size)
+    width = size // buckets
+    blocks = y[:width * buckets].reshape(buckets, width)
+    offsets = np.arange(buckets) * width
+    return np.unique(np.concatenate([
+        offsets + blocks.argmin(axis=1),
+        offsets + blocks.argmax(axis=1),
+        [size - 1]
+    ]))
+
+
+def downsample(x, y, width: int, method: str="lttb"):
+    """Downsample a series to about the given number of points
+
+    Missing values are dropped. Datetimes are downsampled by their integer
+    representation.
+
+    """
+    (x, y) = (np.asarray(x), np.asarray(y, dtype=float))
+    keep = np.isfinite(y)
+    (x, y) = (x[keep], y[keep])
+    numeric = (
+        x.astype("datetime64[ns]").astype(np.int64).astype(float)
+        if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    )
+    index = {"lttb": lttb, "minmax": minmax}[method](numeric, y, width)
+    return (x[index], y[index])
+
+
+def Scattergl(x, y, width: int=1000, method: str="lttb", **kwargs):
+    """WebGL line trace downsampled to the pixel width of the plot
+
+    """
+    import plotly.graph_objects as go
+
+    (x, y) = downsample(x, y, width=width, method=method)
+    return go.Scattergl(x=x, y=y, **kwargs)
+
+
+def signature(figure: Dict) -> Dict:
+    """Small description of a figure's structure
+
+    Stored in the browser next to a rendered figure so that callbacks can
+    decide on a partial update without uploading the figure itself.
+
+    """
+    return {
+        "title": figure.get("layout", {}).get("title"),
+        "traces": [
+            [x.get("type"), x.get("name")] for x in figure.get("data", [])
+        ]
+    }
+
+
+def patch(current: Dict, figure: Dict):
+    """Update of an already rendered figure
+
+    ``current`` is the :func:`signature` of the rendered figure. If it has
+    the same traces, only the trace data is sent to the browser using a
+    partial property update. Otherwise, or with Dash versions not
+    supporting partial updates, the whole figure is sent.
+
+    """
+    if not hasattr(dash, "Patch") or current != signature(figure):
+        return figure
+    update = dash.Patch()
+    for (i, trace) in enumerate(figure["data"]):
+        update["data"][i]["x"] = trace["x"]
+        update["data"][i]["y"] = trace["y"]
+    return update
@@ -0,0 +1,74 @@
+"""Startup time benchmark of the Dash app
+
+Builds the app with :func:`index.create_app` in fresh interpreters and
+reports the best wall time, together with whether heavy modules were loaded
+and background threads started during startup. Layouts, Plotly and the
+service clients should only be loaded when a page is visited.
+
+Usage::
+
+    python startup.py --repeat 5
+
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# Run in a fresh interpreter so that the imports are measured cold
+SCRIPT = """
+import json, sys, threading, time
+start = time.perf_counter()
+import index, pages
+index.create_app(subpages=pages.subpages)
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "modules": [m for m in sys.argv[1:] if m in sys.modules],
+    "threads": threading.active_count() - 1
+}))
+"""
+
+# Modules that should not be loaded at startup
+HEAVY = ["plotly.graph_objects", "plotly.subplots", "stores.services"]
+
+
+def measure(repeat: int=5) -> dict:
+    """Best startup time in seconds of ``repeat`` cold starts
+
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", SCRIPT] + HEAVY,
+                cwd=here,
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout.splitlines()[-1]
+        )
+        for _ in range(repeat)
+    ]
+    return min(runs, key=lambda x: x["seconds"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="Number of cold starts"
+    )
+    args = parser.parse_args(argv)
+    result = measure(args.repeat)
+    print("create_app        {0:.3f} s".format(result["seconds"]))
+    print("heavy modules     {0}".format(
+        ", ".join(result["modules"]) or "none"
+    ))
+    print("threads started   {0}".format(result["threads"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,16 @@ Run as main script to start the Flask based WSGI server.
 
 """
 
+# Make sockets, threads and sleeps cooperative before anything imports
+# them, so that blocking data requests in callbacks only suspend their own
+# greenlet instead of the whole server
+from gevent import monkey
+monkey.patch_all()
 
-from gevent.pywsgi import WSGIServer
+from gevent.pywsgi import WSGIServer  # noqa: E402
 
-import index
-import pages
+import index  # noqa: E402
+import pages  # noqa: E402
 
 
 def run():
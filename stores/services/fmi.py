@@ -10,12 +10,13 @@ import pandas as pd
 
 from stores import Endpoint, utils
 from stores.common.caching import Pickle
+from stores.common.registry import register
 
 
 CACHE = os.path.abspath(".pandas-datastores/fmi")
 
 
-def API():
+def API(url: str="https://opendata.fmi.fi/wfs"):
     """Client for the Finnish Meteorological Institute weather API
 
     Contains two endpoints:
@@ -31,8 +32,8 @@ def API():
     Parameters
     ----------
 
-    key : str
-        User key for accessing the API
+    url : str
+        Address of the WFS service, e.g. a mirror or a local stand-in
 
     Example
     -------
@@ -46,6 +47,11 @@ def API():
             lat=60.0, lon=20.0
         )
 
+        # Download only selected quantities
+        data = api.forecast_hirlam_surface_point_hourly_2d.get(
+            lat=60.0, lon=20.0, columns=["Temperature", "Pressure"]
+        )
+
     Notes
     -----
 
@@ -60,10 +66,11 @@ def API():
     from bs4 import BeautifulSoup
 
     session = requests.Session()
+    base = url
 
     def WfsV2Endpoint(tf_response, url, tf_params):
         return Endpoint(
-            url="https://opendata.fmi.fi/wfs?service=WFS&version=2.0.0&" + url,
+            url=base + "?service=WFS&version=2.0.0&" + url,
             defaults={"request": "getFeature"},
             tf_get_response=tf_response,
             tf_get_params=tf_params,
@@ -81,6 +88,19 @@ def API():
             {**params, **latlon(params)}, lambda x: utils.dissoc(x, "lat", "lon")
         )
 
+    def tf_columns(params):
+        """Push column selection into the stored query
+
+        """
+        columns = params.get("columns")
+        return utils.pipe(
+            {
+                **params,
+                **({"parameters": ",".join(columns)} if columns else {})
+            },
+            lambda x: utils.dissoc(x, "columns")
+        )
+
     strip_block = utils.compose(
         utils.listmap(lambda x: x.split(" ")),
         utils.listmap(str.strip),
@@ -131,18 +151,18 @@ def API():
             ).format(
                 (
                     pd.Timestamp.now("UTC")
-                    .floor("H")
+                    .floor("h")
                     .strftime('%Y-%m-%dT%H:%M:%SZ')
                 ),
                 (
                     (
                         pd.Timestamp.now("UTC")
-                        .floor("H") + pd.Timedelta("47H")
+                        .floor("h") + pd.Timedelta("47h")
                     )
                     .strftime('%Y-%m-%dT%H:%M:%SZ')
                 )
             ),
-            tf_params=tf_latlon
+            tf_params=utils.compose(tf_columns, tf_latlon)
         )
 
         historical_forecast_hirlam_surface_point_hourly_2d = WfsV2Endpoint(
@@ -157,27 +177,29 @@ def API():
                 (
                     (
                         pd.Timestamp.now("UTC")
-                        .floor("H") - pd.Timedelta("48H")
+                        .floor("h") - pd.Timedelta("48h")
                     )
                     .strftime('%Y-%m-%dT%H:%M:%SZ')
                 ),
                 (
-                    pd.Timestamp.now("UTC").floor("H")
+                    pd.Timestamp.now("UTC").floor("h")
                     .strftime('%Y-%m-%dT%H:%M:%SZ')
                 )
             ),
-            tf_params=tf_latlon
+            tf_params=utils.compose(tf_columns, tf_latlon)
         )
 
     return Client()
 
 
-def Helsinki(filepath=os.path.join(CACHE, "helsinki.p")):
+@register(API)
+def Helsinki(filepath=os.path.join(CACHE, "helsinki.p"), columns=None):
 
     def download(api):
         return api.forecast_hirlam_surface_point_hourly_2d.get(
             lat=60.1699,
-            lon=24.9384
+            lon=24.9384,
+            columns=columns
         )
 
     return Pickle(filepath, download)
@@ -6,14 +6,20 @@ import logging
 import os
 import requests
 from requests.utils import requote_uri
-from typing import Dict
+from typing import Dict, List
 
 import attr
+import numpy as np
 import pandas as pd
 from user_agent import generate_user_agent
 
 from stores import Endpoint, utils
-from stores.common.caching import (JSON, Pickle, lift)
+from stores.common.caching import (
+    JSON, Loaded, Pickle, Source, lift, memoize
+)
+from stores.common.extract import extract_json
+from stores.common.registry import register
+from stores.common.timeseries import ChunkStore
 
 
 CACHE = os.path.abspath(".pandas-datastores")
@@ -59,11 +65,142 @@ ARGS_0 = [
 ]
 
 
-# NOTE: These are now hard-coded in the method
+# Forecast years, "0" stands for the company metadata
 ARGS_1 = ["0", "2020", "2021"]
 
 
-def API():
+def read_isin() -> Dict:
+    """ISIN to company name lookup
+
+    """
+    with open(here("data", "isin.json"), "r") as f:
+        return json.load(f)
+
+
+def tf_company_forecast(
+        records: List[Dict],
+        years: List[str],
+        isin: Dict=None
+) -> Dict:
+    """Company forecasts pivoted in a single pass
+
+    Returns a dictionary with the following items:
+
+        * frame -- Float forecasts indexed by (company, isin, year)
+        * meta -- Target price, recommendation and ISIN per company
+        * this, next and each year -- Forecasts of a single year
+
+    The rows are grouped by year so that the single year forecasts are
+    slices of the same float array as ``frame``.
+
+    """
+    isin = read_isin() if isin is None else isin
+    codes = pd.Categorical(
+        [x.get("year") for x in records], categories=["0"] + years
+    ).codes
+    # Rows of other years are dropped, they would shift the year groups
+    data = pd.DataFrame.from_records(records).iloc[
+        np.argsort(codes, kind="stable")[(codes < 0).sum():]
+    ]
+    year = data["year"].to_numpy()
+    companies = pd.Index([isin.get(v) for v in data["isin"]], name="company")
+    columns = [
+        c for c in data.columns
+        if c not in ("year", "target_price", "suositus", "isin")
+    ]
+    values = (
+        data[columns]
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=float)
+    )
+    # Row ranges of each year group
+    stops = np.cumsum([(year == y).sum() for y in ["0"] + years])
+    bounds = dict(zip(["0"] + years, zip([0, *stops[:-1]], stops)))
+
+    def view(y):
+        (start, stop) = bounds[y]
+        return pd.DataFrame(
+            values[start:stop],
+            index=companies[start:stop],
+            columns=columns,
+            copy=False
+        )
+
+    meta = slice(*bounds["0"])
+    return {
+        "frame": pd.DataFrame(
+            values[meta.stop:],
+            index=pd.MultiIndex.from_arrays(
+                [
+                    companies[meta.stop:],
+                    data["isin"].to_numpy()[meta.stop:],
+                    year[meta.stop:]
+                ],
+                names=["company", "isin", "year"]
+            ),
+            columns=columns,
+            copy=False
+        ),
+        "meta": pd.DataFrame(
+            index=companies[meta],
+            data={
+                "target_price": pd.to_numeric(
+                    data["target_price"].to_numpy()[meta], errors="coerce"
+                ).astype(float),
+                "suositus": data["suositus"].to_numpy()[meta],
+                "isin": data["isin"].to_numpy()[meta]
+            }
+        ),
+        **{y: view(y) for y in years},
+        **dict(zip(["this", "next"], map(view, years)))
+    }
+
+
+# =======================
+# Page data preprocessing
+# =======================
+
+
+# Company data embedded in the comparison page
+tf_raw_json = utils.compose(
+    lambda d: (
+        d
+        .get("inderes_ranking")
+        .get("company_gathered_data")
+    ),
+    lambda res: extract_json(res.text, "Drupal.settings,")
+)
+
+
+def tf_data_table(raw_json: Dict, isin: Dict=None) -> pd.DataFrame:
+    """Typed stock price table from the company data
+
+    """
+    isin = read_isin() if isin is None else isin
+    return utils.pipe(
+        list(raw_json.values()),
+        lambda x: pd.DataFrame(
+            index=[isin.get(v["isin"]) for v in x],
+            data=x
+        ),
+        lambda data: data.astype({
+            'diff1d': float,
+            'diff1dprc': float,
+            'bidprice': float,
+            'askprice': float,
+            'lastprice': float,
+            'dayhighprice': float,
+            'daylowprice': float,
+            'closeprice1d': float,
+            'turnover': float,
+            'quantity': float,
+            'timestamp': float,
+            'this_month_millistream': float,
+        })
+    )
+
+
+def API(years: List[str]=ARGS_1[1:]):
     """Client for downloading data in the Inderes table
 
     Main endpoints:
@@ -96,12 +233,17 @@ def API():
 
     TODO: Example on how to retrieve the most important fundamentals
 
+    Parameters
+    ----------
+    years : List[str]
+        Forecast years. The first two are also available as ``this`` and
+        ``next`` in the company forecast.
+
     """
 
     session = requests.Session()
 
-    with open(here("data", "isin.json"), "r") as f:
-        isin = json.load(f)
+    isin = read_isin()
 
     def headers_hook(*args, **kwargs):
         """Randomize user agent
@@ -112,44 +254,7 @@ def API():
         }
 
     def tf_company_response(res):
-
-        get_meta = utils.compose(
-            lambda x: pd.DataFrame(
-                index=[isin.get(v["isin"]) for v in x],
-                data=[
-                    {
-                        "target_price": utils.safe_float(v.get("target_price")),
-                        "suositus": v.get("suositus"),
-                        "isin": v.get("isin")
-                    } for v in x
-                ]
-            ),
-            utils.listfilter(lambda x: x["year"] == "0")
-        )
-
-        def create_get_year(year):
-            return utils.compose(
-                lambda x: pd.DataFrame(
-                    index=[isin.get(v["isin"]) for v in x],
-                    data=[
-                        utils.dissoc(v, "target_price", "suositus", "isin")
-                        for v in x
-                    ]
-                ).astype(float),
-                utils.listfilter(lambda x: x["year"] == year)
-            )
-
-        get_this = create_get_year(ARGS_1[1])
-        get_next = create_get_year(ARGS_1[2])
-
-        return utils.pipe(
-            res.json(),
-            lambda x: {
-                "meta": get_meta(x),
-                "this": get_this(x),
-                "next": get_next(x)
-            }
-        )
+        return tf_company_forecast(res.json(), years=years, isin=isin)
 
     @attr.s(frozen=True)
     class Client():
@@ -163,7 +268,7 @@ def API():
             headers_hook=headers_hook,
             defaults={
                 "args_0": ",".join(ARGS_0),
-                "args_1": ",".join(ARGS_1)
+                "args_1": ",".join(["0"] + years)
             },
             tf_url=utils.compose(
                 requote_uri,
@@ -180,21 +285,7 @@ def API():
             session=session,
             url="https://www.inderes.fi/fi/osakevertailu",
             headers_hook=headers_hook,
-            tf_get_response=utils.compose(
-                lambda d: (
-                    d
-                    .get("inderes_ranking")
-                    .get("company_gathered_data")
-                ),
-                json.loads,
-                lambda res: (
-                    res
-                    .text
-                    .split("Drupal.settings,")[1]
-                    .split(");")[0]
-                    .strip()
-                )
-            )
+            tf_get_response=tf_raw_json
         )
 
         data_table = Endpoint(
@@ -202,38 +293,8 @@ def API():
             url="https://www.inderes.fi/fi/osakevertailu",
             headers_hook=headers_hook,
             tf_get_response=utils.compose(
-                lambda data: data.astype({
-                    'diff1d': float,
-                    'diff1dprc': float,
-                    'bidprice': float,
-                    'askprice': float,
-                    'lastprice': float,
-                    'dayhighprice': float,
-                    'daylowprice': float,
-                    'closeprice1d': float,
-                    'turnover': float,
-                    'quantity': float,
-                    'timestamp': float,
-                    'this_month_millistream': float,
-                }),
-                lambda x: pd.DataFrame(
-                    index=[isin.get(v["isin"]) for v in x],
-                    data=x
-                ),
-                lambda d: list(d.values()),
-                lambda d: (
-                    d
-                    .get("inderes_ranking")
-                    .get("company_gathered_data")
-                ),
-                json.loads,
-                lambda res: (
-                    res
-                    .text
-                    .split("Drupal.settings,")[1]
-                    .split(");")[0]
-                    .strip()
-                )
+                lambda x: tf_data_table(x, isin=isin),
+                tf_raw_json
             )
         )
 
@@ -245,14 +306,20 @@ def API():
 # ====================
 
 
-def update_isin_lookup():
+def update_isin_lookup(raw_json: Dict=None):
     """Fetch (ISIN, company_name) pairs
 
+    Parameters
+    ----------
+    raw_json : Dict
+        Already downloaded company data. If None, the page is downloaded.
+
     """
+    raw_json = API().raw_json.get() if raw_json is None else raw_json
     with open(here("data", "isin.json"), "w+") as f:
         json.dump(
             utils.pipe(
-                API().raw_json.get(),
+                raw_json,
                 lambda table: {
                     isin: table.get(isin).get("company_name")
                     for isin in sorted(list(table.keys()))
@@ -264,6 +331,7 @@ def update_isin_lookup():
     logging.info("Updated ISIN lookup")
 
 
+@register(API)
 def CompanyForecast(filepath=os.path.join(CACHE, "company-forecast.p")):
 
     def download(api) -> Dict:
@@ -272,20 +340,36 @@ def CompanyForecast(filepath=os.path.join(CACHE, "company-forecast.p")):
     return Pickle(filepath, download)
 
 
-def DataTable(filepath=os.path.join(CACHE, "data-table.p")):
+def RawJSON(filepath=os.path.join(CACHE, "raw-json.json")):
 
     def download(api):
-        return api.data_table.get()
+        return api.raw_json.get()
 
-    return Pickle(filepath, download)
+    return JSON(filepath, download)
 
 
-def RawJSON(filepath=os.path.join(CACHE, "raw-json.json")):
+# NOTE: Updates also the raw JSON cache
+@register(API)
+def DataTable(filepath=os.path.join(CACHE, "data-table.p"), raw_json=None):
+    """Stock price table derived from the raw company data
 
-    def download(api):
-        return api.raw_json.get()
+    Updating the table also updates the raw company data cache, so that
+    both are obtained with a single page download and parse:
 
-    return JSON(filepath, download)
+    .. code-block :: python
+
+        table = DataTable().update(api)
+        update_isin_lookup(RawJSON().load())
+
+    """
+    raw_json = RawJSON() if raw_json is None else raw_json
+    # NOTE: Landfill whose "download" transforms the raw company data
+    table = Pickle(filepath, tf_data_table)
+    return Source(
+        download=utils.compose(tf_data_table, raw_json.download),
+        load=table.load,
+        update=utils.compose(table.update, raw_json.update)
+    )
 
 
 def ShareNumber(year: str="this"):
@@ -375,3 +459,111 @@ def DividendYield(year: str="this"):
         )
 
     return dividend_yield(CompanyForecast(), DataTable())
+
+
+@register(
+    API,
+    depends=("inderes.CompanyForecast", "inderes.DataTable"),
+    # Derive from the already updated input caches
+    update=lambda api: Screener(
+        company_forecast=Loaded(CompanyForecast()),
+        data_table=Loaded(DataTable())
+    ).update(api)
+)
+def Screener(
+        filepath=os.path.join(CACHE, "screener.p"),
+        company_forecast=None,
+        data_table=None
+):
+    """Fundamental ratios for every forecast year
+
+    The inputs are aligned once and all ratios are computed in one
+    vectorized pass. The result is indexed by ISIN, since the company name
+    lookup may lack recently listed companies, and has (metric, year)
+    columns. It is recomputed on update only if the company forecast or the
+    data table has changed.
+
+    Parameters
+    ----------
+    company_forecast : Source
+        Defaults to ``CompanyForecast()``
+    data_table : Source
+        Defaults to ``DataTable()``
+
+    Example
+    -------
+
+    .. code-block :: python
+
+        screener = Screener().update(api)
+        pe = screener["price_to_earnings"]["2021"].rename(read_isin())
+
+    """
+
+    @memoize(filepath)
+    def screener(company_forecast: Dict, data_table: pd.DataFrame):
+        frame = company_forecast["frame"].droplevel("company")
+        price = utils.pipe(
+            data_table.set_index("isin")["lastprice"],
+            lambda x: x[~x.index.duplicated()],
+            lambda x: x.reindex(frame.index.get_level_values("isin"))
+            .to_numpy()
+        )
+        shares = (
+            frame["no_of_shares_k_year_end"]
+            .add(frame["no_of_shares_a_year_end"])
+            .to_numpy()
+        )
+        return utils.pipe(
+            pd.DataFrame(
+                index=frame.index,
+                data={
+                    "price_to_book": price / frame["bv"].to_numpy() * shares,
+                    "price_to_earnings": price / frame["eps"].to_numpy(),
+                    "dividend_yield": frame["diva"].to_numpy() / price
+                }
+            ),
+            lambda x: x[~np.isnan(price)],
+            lambda x: x.unstack("year")
+        )
+
+    return screener(
+        CompanyForecast() if company_forecast is None else company_forecast,
+        DataTable() if data_table is None else data_table
+    )
+
+
+def SnapshotStore(dirpath=os.path.join(CACHE, "snapshots")):
+    """Append-only history of data table snapshots
+
+    Rows are keyed by ISIN and deduplicated on their quote timestamp.
+
+    Example
+    -------
+
+    .. code-block :: python
+
+        store = SnapshotStore()
+        nokia = store.history("FI0009000681")
+        cross_section = store.cross_section(1608620400)
+
+    """
+    return ChunkStore(dirpath, key="isin", time="timestamp")
+
+
+def Snapshots(dirpath=os.path.join(CACHE, "snapshots")):
+    """Polled data table snapshots
+
+    Updating appends the quotes that have changed since the previous poll.
+
+    """
+    store = SnapshotStore(dirpath)
+
+    def download(api):
+        return api.data_table.get()
+
+    return Source(
+        download=download,
+        load=store.read,
+        update=utils.compose(store.append, download)
+    )
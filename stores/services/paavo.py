@@ -4,15 +4,24 @@ Paavo: http://pxnet2.stat.fi/PXWeb/api/v1/fi/
        Postinumeroalueittainen_avoin_tieto/
 
 """
-import codecs
-import json
+import os
 import requests
 
 import attr
+import numpy as np
 import pandas as pd
 
 from stores import Endpoint, utils
-from stores.services.statfin import transform_get_response
+from stores.common import px
+from stores.common.caching import Loaded, Pickle, memoize
+from stores.common.registry import register
+from stores.services import statfin
+from stores.services.statfin import (
+    transform_get_response, transform_post_response
+)
+
+
+CACHE = os.path.abspath(".pandas-datastores/paavo")
 
 
 def API():
@@ -47,6 +56,7 @@ def API():
         query_selection_filter="item",
         query_selection_values=["00920"],
         response_format="json",
+        columns=None,
         **kwargs
     ):
         return utils.update_dict(
@@ -57,22 +67,22 @@ def API():
                         "filter": query_selection_filter,
                         "values": query_selection_values
                     }
-                }],
+                }] + ([{
+                    # Restrict the downloaded content variables
+                    "code": "Tiedot",
+                    "selection": {
+                        "filter": "item",
+                        "values": list(columns)
+                    }
+                }] if columns else []),
                 "response": {"format": response_format}
             },
             kwargs
         )
 
     tf_post_response = utils.compose(
-        lambda x: x.apply(pd.to_numeric, errors="coerce"),
         lambda x: x.set_index("Tiedot"),
-        lambda x: pd.DataFrame(
-            columns=[y["code"] for y in x["columns"]],
-            data=[y["key"] + y["values"] for y in x["data"]]
-        ),
-        lambda res: json.loads(
-            codecs.decode(res.content, "utf-8-sig")
-        )
+        transform_post_response
     )
 
     @attr.s(frozen=True)
@@ -89,4 +99,126 @@ def API():
             tf_post_response=tf_post_response
         )
 
+        # Whole table as a single PX file
+        all_variables_2018_px = Endpoint(
+            url=(
+                "http://pxnet2.stat.fi/database/"
+                "Postinumeroalueittainen_avoin_tieto/"
+                "2018/paavo_9_koko_2018.px"
+            ),
+            tf_get_response=lambda res: px.parse(res.content),
+            session=session,
+            timeout=60
+        )
+
     return Client()
+
+
+@register(API)
+def AllVariables2018(filepath=os.path.join(CACHE, "all-variables-2018.p")):
+    """All Paavo variables for all zip code areas
+
+    """
+    def download(api):
+        return api.all_variables_2018_px.get()
+
+    return Pickle(filepath, download)
+
+
+def price_features(prices: pd.DataFrame) -> pd.DataFrame:
+    """Latest yearly prices pivoted into one row per zip code
+
+    Columns are named ``<variable>_<Talotyyppi>_<Rakennusvuosi>``.
+
+    """
+    keys = ["Postinumero", "Talotyyppi", "Rakennusvuosi"]
+    time = [
+        c for c in prices if pd.api.types.is_datetime64_any_dtype(prices[c])
+    ]
+    values = [
+        c for c in prices if pd.api.types.is_float_dtype(prices[c])
+    ]
+    latest = (
+        prices[prices[time[0]] == prices[time[0]].max()] if time
+        else prices
+    )
+    wide = (
+        latest
+        .astype({k: str for k in keys})
+        .set_index(keys)[values]
+        .unstack(keys[1:])
+    )
+    wide.columns = ["_".join(map(str, c)) for c in wide.columns]
+    return wide
+
+
+def demographic_features(
+        demographics: pd.DataFrame,
+        level: str="Postinumeroalue"
+) -> pd.DataFrame:
+    """Paavo table reshaped into one row per zip code
+
+    """
+    series = demographics.stack(list(range(demographics.columns.nlevels)))
+    wide = series.unstack([n for n in series.index.names if n != level])
+    wide.columns = (
+        ["_".join(map(str, c)) for c in wide.columns]
+        if isinstance(wide.columns, pd.MultiIndex) else
+        [str(c) for c in wide.columns]
+    )
+    return wide
+
+
+@register(
+    API,
+    depends=("statfin.Yearly", "paavo.AllVariables2018"),
+    # Derive from the already updated input caches
+    update=lambda api: ZipFeatures(
+        prices=Loaded(statfin.Yearly()),
+        demographics=Loaded(AllVariables2018())
+    ).update(api)
+)
+def ZipFeatures(
+        filepath=os.path.join(CACHE, "zip-features.p"),
+        prices=None,
+        demographics=None
+):
+    """Zip code by feature matrix of apartment prices and demographics
+
+    The matrix has a float32 column per feature and is indexed by zip code,
+    so that a single zip lookup is a hash table lookup. The price and
+    demographic blocks are cached separately, and on update only the blocks
+    whose input data has changed are rebuilt.
+
+    Parameters
+    ----------
+    prices : Source
+        Long format apartment prices, defaults to ``statfin.Yearly()``
+    demographics : Source
+        Paavo table, defaults to ``AllVariables2018()``
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        features = ZipFeatures().update(api)
+        kontula = features.loc["00940"]
+
+    """
+    prices = statfin.Yearly() if prices is None else prices
+    demographics = (
+        AllVariables2018() if demographics is None else demographics
+    )
+    (root, _) = os.path.splitext(filepath)
+
+    @memoize(filepath)
+    def join(prices: pd.DataFrame, demographics: pd.DataFrame):
+        data = prices.join(demographics, how="outer").astype(np.float32)
+        data.index = data.index.astype(str).rename("Postinumero")
+        return data
+
+    return join(
+        memoize(root + "-prices.p")(price_features)(prices),
+        memoize(root + "-demographics.p")(demographic_features)(demographics)
+    )
@@ -31,16 +31,20 @@ Rakennusvuosi | Explanation
 """
 
 import codecs
+import functools
 import json
 import os
 import requests
 from time import sleep
 
 import attr
+import numpy as np
 import pandas as pd
 
 from stores import Endpoint, utils
-from stores.common.caching import (JSON, Pickle, lift, bind, Concat)
+from stores.common import px
+from stores.common.caching import (JSON, Loaded, Pickle, lift, bind, Concat)
+from stores.common.registry import register
 
 
 CACHE = os.path.abspath(".pandas-datastores")
@@ -63,6 +67,67 @@ def transform_get_response(res):
     }
 
 
+@functools.lru_cache(maxsize=None)
+def parse_period(text: str) -> pd.Timestamp:
+    """Start time of a period such as ``2020``, ``2020Q1`` or ``2020M01``
+
+    """
+    return (
+        pd.Period(text.replace("M", "-"), freq="M").start_time if "M" in text
+        else pd.Period(text, freq="Q").start_time if "Q" in text
+        else pd.Period(text, freq="Y").start_time
+    )
+
+
+def to_datetime(values) -> pd.DatetimeIndex:
+    """Vectorized period parsing
+
+    Each distinct period is parsed only once.
+
+    """
+    (codes, uniques) = pd.factorize(np.asarray(values, dtype=object))
+    return pd.DatetimeIndex(
+        [parse_period(x) for x in uniques]
+    ).take(codes)
+
+
+def transform_post_response(res) -> pd.DataFrame:
+    """Column-oriented construction of a PX-Web query response
+
+    Key columns become categoricals, time columns datetimes and content
+    columns floats.
+
+    """
+    raw = json.loads(codecs.decode(res.content, "utf-8-sig"))
+    columns = raw["columns"]
+    is_key = [y.get("type") != "c" for y in columns]
+    # Transpose rows into per-column buffers in one pass
+    keys = iter(
+        list(zip(*(y["key"] for y in raw["data"]))) or [()] * sum(is_key)
+    )
+    values = iter(
+        list(zip(*(y["values"] for y in raw["data"]))) or
+        [()] * (len(columns) - sum(is_key))
+    )
+
+    def convert(column, key):
+        if not key:
+            return pd.to_numeric(
+                np.asarray(next(values), dtype=object), errors="coerce"
+            ).astype(float)
+        buffer = next(keys)
+        return (
+            to_datetime(buffer)
+            if column.get("type") == "t" or column["code"].startswith("Vuosi")
+            else pd.Categorical(buffer)
+        )
+
+    return pd.DataFrame({
+        column["code"]: convert(column, key)
+        for (column, key) in zip(columns, is_key)
+    })
+
+
 def API():
     """Client for StatFin data service
 
@@ -81,6 +146,13 @@ def API():
             query_selection_values=["00940"],
         )
 
+        # Query only the selected content variables
+        res = api.apartment_prices_quarterly.post(
+            query_code="Postinumero",
+            query_selection_values=["00940"],
+            columns=["keskihinta_ptno"]
+        )
+
         # Query metadata
         metadata = api.apartment_prices_quarterly.get()
         metadata.Postinumero.valueTexts
@@ -92,7 +164,13 @@ def API():
         )
 
     NOTE: There seems to be an issue downloading all data for all zip codes at
-          once. The suggested method is to query data in chunks.
+          once. The suggested method is to query data in chunks, or to
+          download the whole PX file using the ``*_px`` endpoints:
+
+    .. code-block:: python
+
+        # Full table with (Postinumero, Talotyyppi, ...) MultiIndex
+        table = api.apartment_prices_yearly_px.get()
 
     """
 
@@ -108,7 +186,7 @@ def API():
             url="http://pxnet2.stat.fi/PXWeb/api/v1/fi/StatFin/" + url,
             tf_get_response=tf_get_response,
             tf_post_params=tf_post_params,
-            tf_post_response=tf_post_response,
+            tf_post_response=transform_post_response,
             session=session
         )
 
@@ -117,6 +195,7 @@ def API():
         query_selection_filter="item",
         query_selection_values=["00920"],
         response_format="json",
+        columns=None,
         **kwargs
     ):
         return utils.update_dict(
@@ -127,27 +206,26 @@ def API():
                         "filter": query_selection_filter,
                         "values": query_selection_values
                     }
-                }],
+                }] + ([{
+                    # Restrict the downloaded content variables
+                    "code": "Tiedot",
+                    "selection": {
+                        "filter": "item",
+                        "values": list(columns)
+                    }
+                }] if columns else []),
                 "response": {"format": response_format}
             },
             kwargs
         )
 
-    tf_post_response = utils.compose(
-        lambda x: x.apply(
-            lambda s: (
-                pd.to_datetime(s) if s.name.startswith("Vuosi")
-                else pd.to_numeric(s, errors="coerce")
-            )
-        ),
-        lambda x: pd.DataFrame(
-            columns=[y["code"] for y in x["columns"]],
-            data=[y["key"] + y["values"] for y in x["data"]]
-        ),
-        lambda res: json.loads(
-            codecs.decode(res.content, "utf-8-sig")
+    def PXFileEndpoint(url):
+        return Endpoint(
+            url="http://pxnet2.stat.fi/database/StatFin/" + url,
+            tf_get_response=lambda res: px.parse(res.content),
+            session=session,
+            timeout=60
         )
-    )
 
     @attr.s(frozen=True)
     class Client():
@@ -156,14 +234,22 @@ def API():
             url="asu/ashi/nj/statfin_ashi_pxt_112p.px?",
             tf_get_response=transform_get_response,
             tf_post_params=tf_post_params,
-            tf_post_response=tf_post_response
+            tf_post_response=transform_post_response
         )
 
         apartment_prices_yearly = ApartmentPricesEndpoint(
             url="asu/ashi/vv/statfin_ashi_pxt_112q.px?",
             tf_get_response=transform_get_response,
             tf_post_params=tf_post_params,
-            tf_post_response=tf_post_response
+            tf_post_response=transform_post_response
+        )
+
+        apartment_prices_quarterly_px = PXFileEndpoint(
+            url="asu/ashi/nj/statfin_ashi_pxt_112p.px"
+        )
+
+        apartment_prices_yearly_px = PXFileEndpoint(
+            url="asu/ashi/vv/statfin_ashi_pxt_112q.px"
         )
 
     return Client()
@@ -172,11 +258,10 @@ def API():
 #
 # Data sources
 #
-# TODO: Postinumer column to string (leading zeroes missing)
-# TODO: Function to update all relevant caches
 #
 
 
+@register(API)
 def YearlyMeta(filepath=os.path.join(CACHE, "yearly-meta.json")):
     """Metadata for yearly StatFin apartment prices
 
@@ -190,6 +275,7 @@ def YearlyMeta(filepath=os.path.join(CACHE, "yearly-meta.json")):
     return JSON(filepath, download)
 
 
+@register(API)
 def QuarterlyMeta(filepath=os.path.join(CACHE, "quarterly-meta.json")):
     """Metadata for quarterly StatFin apartment prices
 
@@ -220,7 +306,7 @@ def QuarterlyZip(zip_code):
     """Quarterly apartment prices for a zip code area
 
     """
-    filepath = os.path.join(CACHE, zip_code, "yearly.p")
+    filepath = os.path.join(CACHE, zip_code, "quarterly.p")
 
     def download(api):
         sleep(0.1)
@@ -232,6 +318,28 @@ def QuarterlyZip(zip_code):
     return Pickle(filepath, download)
 
 
+@register(API)
+def YearlyPX(filepath=os.path.join(CACHE, "yearly-px.p")):
+    """All yearly apartment prices from a single PX file download
+
+    """
+    def download(api):
+        return api.apartment_prices_yearly_px.get()
+
+    return Pickle(filepath, download)
+
+
+@register(API)
+def QuarterlyPX(filepath=os.path.join(CACHE, "quarterly-px.p")):
+    """All quarterly apartment prices from a single PX file download
+
+    """
+    def download(api):
+        return api.apartment_prices_quarterly_px.get()
+
+    return Pickle(filepath, download)
+
+
 def ConstructionYear():
 
     @lift
@@ -256,7 +364,10 @@ def HouseTypes():
     return house_types(YearlyMeta())
 
 
-def ZipCodes():
+def ZipCodes(meta=None):
+    """Zip code areas from the metadata source, ``YearlyMeta()`` by default
+
+    """
 
     @lift
     def zip_codes(meta):
@@ -265,10 +376,16 @@ def ZipCodes():
             meta["Postinumero"]["valueTexts"]
         ))
 
-    return zip_codes(YearlyMeta())
+    return zip_codes(YearlyMeta() if meta is None else meta)
 
 
-def Yearly():
+@register(
+    API,
+    depends=("statfin.YearlyMeta",),
+    # Read the zip codes from the already updated metadata cache
+    update=lambda api: Yearly(meta=Loaded(YearlyMeta())).update(api)
+)
+def Yearly(meta=None):
     """All yearly data
 
     """
@@ -279,10 +396,16 @@ def Yearly():
             axis=0
         )
 
-    return Create(ZipCodes())
+    return Create(ZipCodes(meta))
 
 
-def Quarterly():
+@register(
+    API,
+    depends=("statfin.YearlyMeta",),
+    # Read the zip codes from the already updated metadata cache
+    update=lambda api: Quarterly(meta=Loaded(YearlyMeta())).update(api)
+)
+def Quarterly(meta=None):
     """All quarterly data
 
     """
@@ -293,4 +416,4 @@ def Quarterly():
             axis=0
         )
 
-    return Create(ZipCodes())
+    return Create(ZipCodes(meta))
@@ -1,13 +1,46 @@
 """Yahoo Finance
 
 """
-import json
+import os
+import pickle
 import requests
+from typing import Dict, List, Tuple
 
 import attr
 import pandas as pd
 
-from stores import Endpoint, utils
+from stores import Endpoint, get_many, utils
+from stores.common.caching import Source
+from stores.common.extract import extract_json
+
+
+CACHE = os.path.abspath(".pandas-datastores/yahoofinance")
+
+
+def parse_events(events: dict) -> Dict[str, pd.DataFrame]:
+    """Splits and dividends of a chart response indexed by date
+
+    The split ratio is the number of new shares per old share.
+
+    """
+    def frame(records, columns):
+        return pd.DataFrame(
+            index=pd.to_datetime(
+                [x["date"] for x in records], unit="s"
+            ),
+            data={k: [f(x) for x in records] for (k, f) in columns.items()}
+        ).sort_index()
+
+    return {
+        "splits": frame(
+            list(events.get("splits", {}).values()),
+            {"ratio": lambda x: x["numerator"] / x["denominator"]}
+        ),
+        "dividends": frame(
+            list(events.get("dividends", {}).values()),
+            {"amount": lambda x: x["amount"]}
+        )
+    }
 
 
 def API():
@@ -65,7 +98,8 @@ def API():
                             .get("indicators", {})
                             .get("adjclose", [[]])[0]
                         )
-                    )
+                    ),
+                    "events": parse_events(extract(d).get("events", {}))
                 },
                 lambda res: res.json()
             ),
@@ -86,22 +120,14 @@ def API():
             url="https://finance.yahoo.com/quote/",
             tf_get_resource=lambda ticker: ticker + "/financials",
             tf_get_response=utils.compose(
-                lambda text: (
-                    json
-                    .loads(text)
+                lambda d: (
+                    d
                     .get("context")
                     .get("dispatcher")
                     .get("stores")
                     .get("QuoteSummaryStore")
                 ),
-                lambda res: (
-                    res
-                    .text
-                    .split("root.App.main =")[1]
-                    .split("(this)")[0]
-                    .split(";\n}")[0]
-                    .strip()
-                )
+                lambda res: extract_json(res.text, "root.App.main =")
             )
         )
 
@@ -113,3 +139,266 @@ def API():
         )
 
     return Client()
+
+
+def charts(
+        api,
+        tickers: List[str],
+        threads: int=8,
+        interval: float=0.1,
+        **params
+) -> Tuple[pd.DataFrame, Dict]:
+    """Concurrent chart download for many tickers
+
+    Failed tickers are reported instead of aborting the whole batch.
+
+    Parameters
+    ----------
+    api : Client
+        Yahoo Finance client whose session is shared by the threads
+    tickers : List[str]
+        Ticker symbols
+    threads : int
+        Maximum number of concurrent requests
+    interval : float
+        Minimum number of seconds between consecutive requests
+    params
+        Query parameters passed to each chart request
+
+    Returns
+    -------
+    Panel of quotes indexed by (ticker, timestamp) and a dictionary of
+    exceptions of the failed tickers.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        (panel, failures) = charts(API(), ["MSFT", "AAPL", "NOKIA.HE"])
+        nokia = panel.loc["NOKIA.HE"]
+
+    """
+    results = dict(zip(
+        tickers,
+        get_many(
+            api.chart,
+            [{"resource": ticker, **params} for ticker in tickers],
+            threads=threads,
+            interval=interval,
+            return_exceptions=True
+        )
+    ))
+    failures = {
+        k: v for (k, v) in results.items() if isinstance(v, Exception)
+    }
+    quotes = {
+        k: v["quotes"] for (k, v) in results.items() if k not in failures
+    }
+    return (
+        pd.concat(quotes, names=["ticker", "timestamp"]) if quotes else
+        pd.DataFrame(
+            index=pd.MultiIndex.from_arrays(
+                [[], []], names=["ticker", "timestamp"]
+            )
+        ),
+        failures
+    )
+
+
+def merge_quotes(
+        stored: pd.DataFrame,
+        new: pd.DataFrame,
+        events: Dict[str, pd.DataFrame]=None
+) -> pd.DataFrame:
+    """Merge newly downloaded bars into stored bars
+
+    The stored history is adjusted for the splits and dividends in
+    ``events`` (see :func:`parse_events`) dated after the last stored bar.
+    Splits rescale prices and volume, dividends rescale the adjusted close
+    before the ex-dividend date by ``1 - amount / previous close``. The new
+    bars take precedence on the overlap, so a stored bar which was still
+    open at the previous update is replaced.
+
+    """
+    events = {} if events is None else events
+    last = stored.index.max() if len(stored) else None
+
+    def after(name):
+        x = events.get(name)
+        return (
+            x[x.index > last] if x is not None and last is not None
+            else pd.DataFrame()
+        )
+
+    splits = after("splits")
+    if len(splits):
+        ratio = splits["ratio"].prod()
+        stored = stored.assign(**{
+            **{
+                c: stored[c] / ratio
+                for c in ["open", "high", "low", "close", "adjclose"]
+                if c in stored
+            },
+            **(
+                {"volume": stored["volume"] * ratio}
+                if "volume" in stored else {}
+            )
+        })
+    merged = utils.pipe(
+        pd.concat([stored[~stored.index.isin(new.index)], new]),
+        lambda x: x.sort_index()
+    )
+    dividends = after("dividends")
+    if len(dividends) and "adjclose" in stored and "close" in merged:
+        factor = pd.Series(1.0, index=stored.index)
+        for (date, amount) in dividends["amount"].items():
+            previous = merged["close"][merged.index < date]
+            if len(previous) and previous.iloc[-1] > 0:
+                factor[factor.index < date] *= (
+                    1 - amount / previous.iloc[-1]
+                )
+        adjusted = (stored["adjclose"] * factor)[
+            ~stored.index.isin(new.index)
+        ]
+        merged.loc[adjusted.index, "adjclose"] = adjusted
+    return merged
+
+
+# Aggregation of each chart column when resampling
+OHLCV = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "adjclose": "last",
+    "volume": "sum"
+}
+
+
+def resample_ohlcv(quotes: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Aggregate bars into coarser bars
+
+    The bars are labeled by the start of their period and periods without
+    any quotes are dropped.
+
+    """
+    return utils.pipe(
+        quotes.resample(rule, label="left", closed="left"),
+        lambda x: x.agg({k: v for (k, v) in OHLCV.items() if k in quotes}),
+        lambda x: x.dropna(subset=[c for c in ["close"] if c in x])
+    )
+
+
+def update_bars(
+        bars: pd.DataFrame,
+        quotes: pd.DataFrame,
+        rule: str
+) -> pd.DataFrame:
+    """Incrementally update aggregated bars
+
+    Only the last stored period, which may have been incomplete, and the
+    periods after it are recomputed.
+
+    """
+    if bars is None or bars.empty:
+        return resample_ohlcv(quotes, rule)
+    start = bars.index.max()
+    return pd.concat([
+        bars[bars.index < start],
+        resample_ohlcv(quotes[quotes.index >= start], rule)
+    ])
+
+
+def Chart(
+        ticker: str,
+        interval: str="1d",
+        filepath: str=None,
+        resolutions: Tuple[str]=()
+):
+    """Cached chart with incremental updates
+
+    Updating downloads only the bars starting from the last stored timestamp
+    and merges them into the stored history, see :func:`merge_quotes`.
+
+    Coarser OHLCV bars of the given resolutions (Pandas offset aliases) are
+    stored alongside the quotes and updated incrementally. If the stored
+    history was rescaled due to a split or dividend, they are recomputed.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        msft = Chart("MSFT", interval="1m", resolutions=["5min", "1h"])
+        hourly = msft.update(api)["bars"]["1h"]
+
+    """
+    filepath = (
+        os.path.join(CACHE, ticker, interval + ".p") if filepath is None
+        else filepath
+    )
+
+    def get(api, period1):
+        return api.chart.get(
+            ticker,
+            period1=period1,
+            period2=int(pd.Timestamp.now("UTC").timestamp()),
+            interval=interval,
+            # Let the periods define the range
+            range=None
+        )
+
+    def download(api):
+        return utils.pipe(
+            get(api, -2208988800),
+            lambda x: {
+                **x,
+                "bars": {
+                    rule: resample_ohlcv(x["quotes"], rule)
+                    for rule in resolutions
+                }
+            }
+        )
+
+    def load():
+        with open(filepath, "rb") as f:
+            return pickle.load(f)
+
+    def dump(data):
+        with open(filepath, "wb+") as f:
+            pickle.dump(data, f)
+        return data
+
+    @utils.mkdir(filepath)
+    def update(api):
+        if not os.path.exists(filepath):
+            return dump(download(api))
+        stored = load()
+        if stored["quotes"].empty:
+            return dump(download(api))
+        new = get(api, int(stored["quotes"].index.max().timestamp()))
+        quotes = merge_quotes(
+            stored["quotes"], new["quotes"], new.get("events")
+        )
+        # Adjustments change all earlier bars, including the first one
+        rescaled = not quotes.iloc[:1].equals(stored["quotes"].iloc[:1])
+        bars = {} if rescaled else stored.get("bars", {})
+        return dump({
+            **stored,
+            "meta": new["meta"],
+            "quotes": quotes,
+            "events": {
+                k: utils.pipe(
+                    pd.concat([stored.get("events", {}).get(k), v]),
+                    lambda x: x[~x.index.duplicated(keep="last")]
+                )
+                for (k, v) in new.get("events", {}).items()
+            },
+            "bars": {
+                rule: update_bars(bars.get(rule), quotes, rule)
+                for rule in resolutions
+            }
+        })
+
+    return Source(download=download, load=load, update=update)